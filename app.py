@@ -1,10 +1,24 @@
+import base64
+import itertools
+import json
 import os
-import spacy
-import fitz  # PyMuPDF
-from collections import defaultdict
-from flask import Flask, jsonify, render_template, request
+import threading
+import time
+import zipfile
+from flask import Flask, Response, jsonify, render_template, request
 from flask_cors import CORS
-from neo4j import GraphDatabase
+from centrality import METRICS, CentralityIndex
+from communities import CommunitySummary
+from graph_backend import EMBEDDED_GRAPH_PATH, GRAPH_BACKEND, open_backend
+from graph_encoding import MIMETYPES, available_encodings, compress, encode_payload
+from graph_layout import GraphLayout
+from ingest_jobs import JobManager, QueueFullError
+from path_finder import DEFAULT_MAX_DEPTH, DEFAULT_PATHS, PathIndex, describe_paths
+from provenance import SHARED_GROUP
+from response_cache import ResponseCache
+from result_cache import store_upload
+from search_index import SearchIndex
+from vector_index import VectorIndex
 
 # --- GENERAL SETTINGS ---
 # Create the Flask application
@@ -16,155 +30,477 @@ UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Load the spaCy model ONCE when the application starts (improves performance)
-print("Loading spaCy model...")
-NLP_MODEL = spacy.load("en_core_web_lg")
-print("Model loaded.")
+# The spaCy model is loaded by the ingestion workers, not by the web process.
+# "background" starts the workers (and their models) right after startup,
+# "lazy" waits for the first upload.
+NLP_STARTUP = os.environ.get("NLP_STARTUP", "background")
+# Set to 1 to wipe the database and reload the sample data on every start
+RESET_DATABASE_ON_STARTUP = os.environ.get("RESET_DATABASE_ON_STARTUP", "0") == "1"
 
 # --- NEO4J SETTINGS ---
 URI = "bolt://localhost:7687"
 AUTH = ("neo4j", "12345678")  # Remember to use your password
-driver = GraphDatabase.driver(URI, auth=AUTH)
+# GRAPH_BACKEND=embedded keeps the graph in a local file (EMBEDDED_GRAPH_PATH)
+# instead of Neo4j, for machines without a database server
+backend = open_backend(URI, AUTH, GRAPH_BACKEND, EMBEDDED_GRAPH_PATH)
+# Number of rows sent per UNWIND statement when writing extracted graphs
+NEO4J_BATCH_SIZE = int(os.environ.get("NEO4J_BATCH_SIZE", 1000))
+# Default and maximum page sizes of the paginated read endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 5000))
+# Limits of /api/node/<id>/neighbors: hop depth, edges kept per expanded node
+# and total nodes returned (the expansion stops once it is reached)
+MAX_NEIGHBOR_HOPS = 3
+DEFAULT_NEIGHBOR_LIMIT = 25
+MAX_NEIGHBOR_LIMIT = 200
+MAX_NEIGHBORHOOD_NODES = int(os.environ.get("MAX_NEIGHBORHOOD_NODES", 2000))
+# Limits of /api/path: paths returned, edges per path and seconds per search
+MAX_PATHS = 10
+MAX_PATH_DEPTH = 6
+PATH_TIME_BUDGET = float(os.environ.get("PATH_TIME_BUDGET", 2.0))
+
+# Serialized read responses are cached until the graph changes
+RESPONSE_CACHE_ENTRIES = int(os.environ.get("RESPONSE_CACHE_ENTRIES", 256))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 300))
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_ENTRIES, ttl=RESPONSE_CACHE_TTL)
+
+
+# --- SEARCH SETTINGS ---
+# Titles of the corpus CSV are searchable before their papers are ingested
+CORPUS_CSV = os.environ.get("CORPUS_CSV", "SB_publication_PMC.csv")
+MAX_SEARCH_RESULTS = 100
+search_index = SearchIndex()
+# Key of the last node added to the search index; later nodes are picked up on refresh
+search_state = {"last_node_key": None}
+search_lock = threading.Lock()
+
+
+def refresh_search_index():
+    """Adds the nodes written since the last refresh to the search index."""
+    with search_lock:
+        added = 0
+        try:
+            for record in backend.iter_nodes(after=search_state["last_node_key"]):
+                search_index.add("node:" + record["id"], record["fullName"], {
+                    "kind": "node",
+                    "id": record["id"],
+                    "label": record["name"],
+                    "fullLabel": record["fullName"],
+                    "group": record["group"],
+                })
+                search_state["last_node_key"] = record["key"]
+                added += 1
+        except Exception as e:
+            print(f"Error updating the search index: {e}")
+        return added
+
+
+def load_corpus_titles():
+    """Indexes the publication titles of the corpus CSV."""
+    try:
+        from bulk_ingest import read_corpus
+        papers = read_corpus(CORPUS_CSV)
+    except Exception as e:
+        print(f"Could not index corpus titles from {CORPUS_CSV}: {e}")
+        return 0
+    for paper in papers:
+        search_index.add("publication:" + paper["key"], paper["title"], {
+            "kind": "publication",
+            "id": paper["key"],
+            "label": paper["title"],
+            "link": paper["link"],
+        })
+    return len(papers)
+
+
+# --- SIMILARITY SETTINGS ---
+# Embeddings of every searchable item, computed once by the NLP workers
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "vectors")
+# Set to 1 to memory-map the saved embedding matrix instead of reading it into memory
+VECTOR_INDEX_MMAP = os.environ.get("VECTOR_INDEX_MMAP", "0") == "1"
+EMBED_BATCH_SIZE = 1000
+MAX_SIMILAR_RESULTS = 100
+vector_index = VectorIndex(VECTOR_INDEX_DIR, mmap=VECTOR_INDEX_MMAP)
+# Items whose text has no word vector, so they are not sent to the workers again
+unembeddable = set()
+embed_lock = threading.Lock()
+
+
+def embed_missing_items():
+    """Computes embeddings for the searchable items that have none yet and saves the index."""
+    with embed_lock:
+        missing = [(doc_id, payload.get("fullLabel") or payload["label"])
+                   for doc_id, payload in search_index.items()
+                   if doc_id not in vector_index and doc_id not in unembeddable]
+        stored = 0
+        try:
+            for start in range(0, len(missing), EMBED_BATCH_SIZE):
+                batch = missing[start:start + EMBED_BATCH_SIZE]
+                keys = [doc_id for doc_id, _ in batch]
+                vectors = jobs.embed([text for _, text in batch])
+                added = vector_index.add(keys, vectors)
+                stored += added
+                unembeddable.update(key for key in keys if key not in vector_index)
+        except Exception as e:
+            print(f"Error computing embeddings: {e}")
+        if stored:
+            vector_index.save()
+            print(f"Stored {stored} new embeddings")
+        return stored
+
+
+# --- SUMMARY SETTINGS ---
+# Community partition behind /api/data?zoom=, centrality behind /api/data?top=,
+# node positions returned by /api/data and the adjacency snapshot behind
+# /api/path, all rebuilt in the background after writes. "generation" counts
+# the writes, so a snapshot read before the latest one is known to be stale.
+summary_state = {"communities": None, "centrality": None, "layout": None, "paths": None,
+                 "generation": 0, "dirty": True}
+summary_lock = threading.Lock()
+
+
+def refresh_summaries():
+    """Rebuilds the community summary, centrality, layout and path snapshot if the graph changed.
+
+    All are computed from one read of the edges. The community ids and the
+    centrality scores are stored on the nodes in one batched write, and the
+    layout starts from the previous one, so
+    existing nodes keep their place. Requests arriving meanwhile are served
+    from the previous summary and layout.
+    """
+    with summary_lock:
+        if not summary_state["dirty"]:
+            return summary_state
+        summary_state["dirty"] = False
+        try:
+            start = time.perf_counter()
+            version = response_cache.version
+            generation = summary_state["generation"]
+            records = [dict(record, n=node_to_dict(record["n"]), m=node_to_dict(record["m"]))
+                       for record in backend.iter_edges()]
+            communities = CommunitySummary.build(records)
+            communities_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            centrality = CentralityIndex.build(records)
+            properties = centrality.node_properties()
+            for node_id, community in communities.node_community.items():
+                properties[node_id]["community"] = community
+            backend.write_node_properties(properties, batch_size=NEO4J_BATCH_SIZE)
+            backend.flush()
+            centrality_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            layout = GraphLayout.build(records, version, previous=summary_state["layout"])
+            communities.place(layout.positions)
+            paths = PathIndex.build(records, generation)
+        except Exception as e:
+            summary_state["dirty"] = True
+            print(f"Error computing the graph summary: {e}")
+            return summary_state
+        summary_state["communities"] = communities
+        summary_state["centrality"] = centrality
+        summary_state["layout"] = layout
+        summary_state["paths"] = paths
+        print(f"Found {len(communities)} communities in {communities_seconds:.2f}s, "
+              f"scored {len(centrality)} nodes in {centrality_seconds:.2f}s, laid out {len(layout)} nodes in {time.perf_counter() - start:.2f}s")
+    # Cached responses were built without the new summary and positions
+    response_cache.bump()
+    return summary_state
+
+
+def schedule_summary_refresh():
+    """Marks the summary, centrality, layout and path snapshot stale and rebuilds them off the caller's thread."""
+    summary_state["generation"] += 1
+    summary_state["dirty"] = True
+    threading.Thread(target=refresh_summaries, name="graph-summary", daemon=True).start()
+
+
+def place_node(node):
+    """Adds the precomputed ``x``/``y`` position to a node view when the layout has it."""
+    layout = summary_state["layout"]
+    return node if layout is None else layout.place(node)
+
+
+def on_job_finished(job):
+    """Invalidates cached reads and indexes new nodes once a background job has written to the graph."""
+    if job["stage"] == "done" and not (job["result"] or {}).get("already_loaded"):
+        response_cache.bump()
+        refresh_search_index()
+        schedule_summary_refresh()
+        # Runs off the pool's result thread, which must stay free to deliver the embeddings
+        threading.Thread(target=embed_missing_items, name="embed-items", daemon=True).start()
+
+
+# --- INGESTION SETTINGS ---
+# Uploads are processed by a pool of worker processes, each with its own spaCy model
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 2))
+# Maximum number of queued or running jobs before new uploads are rejected
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 8))
+# Batch uploads: documents of one batch processed at a time (the "parallelism"
+# parameter can only lower it), PDFs accepted per batch, documents all batches
+# may hold back while they wait for the queue (they take no queue slot until
+# submitted) and size of one ZIP member
+BATCH_PARALLELISM = int(os.environ.get("BATCH_PARALLELISM", INGEST_WORKERS))
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", 50))
+BATCH_BACKLOG = max(int(os.environ.get("BATCH_BACKLOG", 200)), MAX_BATCH_FILES)
+MAX_BATCH_MEMBER_BYTES = int(os.environ.get("MAX_BATCH_MEMBER_BYTES", 200 * 1024 * 1024))
+# Extracted text and NLP results are cached on disk by the SHA-256 of the PDF
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "cache")
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+jobs = JobManager(URI, AUTH, workers=INGEST_WORKERS, max_pending=INGEST_QUEUE_SIZE,
+                  max_backlog=BATCH_BACKLOG, batch_size=NEO4J_BATCH_SIZE, cache_dir=RESULT_CACHE_DIR,
+                  cache_max_bytes=RESULT_CACHE_MAX_BYTES, on_finish=on_job_finished,
+                  backend=backend if GRAPH_BACKEND == "embedded" else None)
+
+# --- STARTUP ---
+# Progress of the background startup tasks, reported by /api/ready
+startup_state = {"backend": GRAPH_BACKEND, "database": "pending", "schema": "pending", "sample_data": "pending"}
+
 
-# Clear database on startup
 def clear_database():
-    """Clear all data from Neo4j database"""
+    """Clear all data from the graph database"""
     try:
-        with driver.session(database="neo4j") as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            print("Database cleared successfully!")
-            return True
+        backend.clear()
+        print("Database cleared successfully!")
+        return True
     except Exception as e:
         print(f"Error clearing database: {e}")
         return False
 
-# Load sample data after clearing
+
+def database_is_empty():
+    """Returns True if the database has no nodes; raises if Neo4j is not available."""
+    return backend.is_empty()
+
+
 def load_sample_data():
     """Load the sample data from both articles"""
     try:
-        # Import and run the sample data loader
-        import subprocess
-        import sys
-        result = subprocess.run([sys.executable, "load_sample_data.py"], 
-                              capture_output=True, text=True)
-        if result.returncode == 0:
-            print("Sample data loaded successfully!")
-            return True
-        else:
-            print(f"Error loading sample data: {result.stderr}")
-            return False
+        # Seed from the declarative files in seed_data/ with the app's own backend
+        from load_sample_data import seed_database
+        stats = seed_database(backend, batch_size=NEO4J_BATCH_SIZE)
+        print(f"Sample data loaded successfully in {stats['timings']['total']}s!")
+        return True
     except Exception as e:
         print(f"Error loading sample data: {e}")
         return False
 
-# Try to clear and load data, but continue if Neo4j is not available
-if clear_database():
-    load_sample_data()
-else:
-    print("Neo4j not available - running in demo mode without database")
 
+def store_missing_article_groups():
+    """Computes the article group of nodes written before provenance was tracked."""
+    try:
+        updated = backend.compute_article_groups(missing_only=True, batch_size=NEO4J_BATCH_SIZE)
+        if updated:
+            print(f"Stored article groups on {updated} existing nodes")
+            response_cache.bump()
+    except Exception as e:
+        print(f"Error storing article groups: {e}")
 
-# --- PROCESSING FUNCTIONS (Original script logic) ---
 
-def extract_content_from_pdf(pdf_path):
-    """Extracts text content from a PDF file."""
-    print(f"Extracting text from: {pdf_path}")
-    full_text = ""
+def initialize_database():
+    """Creates the schema and seeds the database if it is empty.
+
+    With RESET_DATABASE_ON_STARTUP the database is wiped and reseeded instead.
+    The search index, the community summary and the layout are built once the
+    data is in place, followed by the embeddings of new items when the NLP workers start
+    in the background.
+    """
+    load_corpus_titles()
     try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                full_text += page.get_text("text") + "\n\n"
+        if RESET_DATABASE_ON_STARTUP:
+            if not clear_database():
+                raise RuntimeError("could not clear the database")
+            vector_index.clear()
+            empty = True
+        else:
+            empty = database_is_empty()
     except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
-        return None
-    return full_text
-
-
-def process_text_to_graph(text):
-    """Processes text to extract entities (nodes) and relationships (edges)."""
-    print("Starting NLP processing...")
-    doc = NLP_MODEL(text)
-    entities = set()
-    relationships = set()
-
-    for ent in doc.ents:
-        entities.add((ent.text.strip(), ent.label_))
-
-    for sent in doc.sents:
-        entities_in_sentence = [(ent.text.strip(), ent.label_) for ent in sent.ents]
-        if len(entities_in_sentence) > 1:
-            for i in range(len(entities_in_sentence)):
-                for j in range(i + 1, len(entities_in_sentence)):
-                    ent1 = entities_in_sentence[i]
-                    ent2 = entities_in_sentence[j]
-                    if ent1 != ent2:
-                        relationships.add((ent1, "RELATED_TO", ent2))
-
-    print(f"Processing complete. Entities: {len(entities)}, Relationships: {len(relationships)}")
-    return entities, relationships
-
-
-def load_data_into_neo4j(entities, relationships):
-    """Connects to Neo4j and loads the nodes and relationships."""
-    print("Loading data into Neo4j...")
-    with driver.session(database="neo4j") as session:
-        # We use MERGE to avoid creating duplicate nodes
-        for name, entity_type in entities:
-            session.run(f"MERGE (n:{entity_type} {{name: $name}})", name=name)
-
-        for (ent1, rel_type, ent2) in relationships:
-            name1, type1 = ent1
-            name2, type2 = ent2
-            session.run(
-                f"MATCH (a:{type1} {{name: $name1}}), (b:{type2} {{name: $name2}}) "
-                f"MERGE (a)-[r:{rel_type}]->(b)",
-                name1=name1, name2=name2
-            )
-    print("Loading into Neo4j complete.")
-
-
-def fetch_graph_data():
-    """Fetches nodes and relationships from Neo4j for visualization."""
+        startup_state["database"] = "unavailable"
+        startup_state["sample_data"] = "skipped"
+        print(f"Neo4j not available - running in demo mode without database: {e}")
+        return
+
+    startup_state["database"] = "available"
+    startup_state["schema"] = "ready" if backend.ensure_schema() else "incomplete"
     try:
-        nodes = []
-        edges = []
-        node_ids = set()
-        with driver.session(database="neo4j") as session:
-            result = session.run("MATCH (n)-[r]->(m) RETURN n, r, m LIMIT 100")
-            for record in result:
-                node_n, rel, node_m = record["n"], record["r"], record["m"]
-
-                if node_n.element_id not in node_ids:
-                    node_ids.add(node_n.element_id)
-                    label = get_node_label(node_n)
-                    full_label = get_full_node_label(node_n)
-                    article_group = get_article_group(node_n)
-                    nodes.append({
-                        "id": node_n.element_id, 
-                        "label": label, 
-                        "fullLabel": full_label,
-                        "group": list(node_n.labels)[0],
-                        "articleGroup": article_group
-                    })
-
-                if node_m.element_id not in node_ids:
-                    node_ids.add(node_m.element_id)
-                    label = get_node_label(node_m)
-                    full_label = get_full_node_label(node_m)
-                    article_group = get_article_group(node_m)
-                    nodes.append({
-                        "id": node_m.element_id, 
-                        "label": label, 
-                        "fullLabel": full_label,
-                        "group": list(node_m.labels)[0],
-                        "articleGroup": article_group
-                    })
-
-                edges.append({"from": rel.start_node.element_id, "to": rel.end_node.element_id, "label": type(rel).__name__})
-        return {"nodes": nodes, "edges": edges}
+        updated = backend.backfill_display_labels(batch_size=NEO4J_BATCH_SIZE)
+        if updated:
+            print(f"Stored display labels on {updated} existing nodes")
+            response_cache.bump()
     except Exception as e:
-        print(f"Neo4j not available, returning demo data: {e}")
-        return get_demo_data()
+        print(f"Error storing display labels: {e}")
+    if not empty:
+        store_missing_article_groups()
+        startup_state["sample_data"] = "skipped"
+        print("Database already has data - skipping sample data")
+        refresh_search_index()
+        refresh_summaries()
+        if NLP_STARTUP == "background":
+            embed_missing_items()
+        return
+
+    startup_state["sample_data"] = "loading"
+    loaded = load_sample_data()
+    startup_state["sample_data"] = "loaded" if loaded else "failed"
+    response_cache.bump()
+    refresh_search_index()
+    refresh_summaries()
+    if NLP_STARTUP == "background":
+        embed_missing_items()
+
+
+def start_background_tasks():
+    """Runs database seeding and worker warm-up off the import path.
+
+    Read endpoints serve requests immediately (falling back to demo data while
+    Neo4j is unreachable); /api/ready reports when everything is up.
+    """
+    threading.Thread(target=initialize_database, name="init-database", daemon=True).start()
+    if NLP_STARTUP == "background":
+        threading.Thread(target=jobs.warm_up, name="warm-up-workers", daemon=True).start()
+
+
+# Spawned ingestion workers re-import this module as __mp_main__ and the Flask
+# reloader imports it once more in its watcher process; only the process that
+# serves requests runs the startup tasks.
+if __name__ != "__mp_main__" and (__name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+    start_background_tasks()
+
+
+# --- GRAPH READS ---
+
+def encode_cursor(key):
+    """Encodes the stable key of the last record on a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(str(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor produced by ``encode_cursor``; raises ValueError if invalid."""
+    if not cursor:
+        return None
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+
+def node_to_dict(view):
+    """Converts a projected node (see ``graph_backend``) into the visualization dictionary."""
+    return dict(view, articleGroup=view["articleGroup"] or SHARED_GROUP)
+
+
+def iter_graph_records(after=None, limit=None):
+    """Yields ("node", dict), ("edge", dict) and a final ("cursor", key) while reading edges.
+
+    Edges are walked in ``id(r)`` order starting after the ``after`` key
+    (skipping the provenance ``MENTIONS`` links), and
+    each endpoint node is yielded once per page, right before its first edge.
+    The backend result is consumed record by record, so nothing is buffered.
+    """
+    node_ids = set()
+    last_key = None
+    count = 0
+    for record in backend.iter_edges(after, limit):
+        node_n, node_m = record["n"], record["m"]
+        for node in (node_n, node_m):
+            if node["id"] not in node_ids:
+                node_ids.add(node["id"])
+                yield "node", place_node(node_to_dict(node))
+        yield "edge", {"from": node_n["id"], "to": node_m["id"], "label": record["type"]}
+        last_key = record["key"]
+        count += 1
+    # A full page means there may be more edges after it
+    yield "cursor", last_key if limit is not None and count == limit else None
+
+
+def iter_node_records(after=None, limit=None):
+    """Yields ("node", dict) in ``id(n)`` order and a final ("cursor", key)."""
+    last_key = None
+    count = 0
+    for record in backend.iter_nodes(after, limit):
+        yield "node", {"name": record["name"], "fullName": record["fullName"],
+                       "id": record["id"], "group": record["group"]}
+        last_key = record["key"]
+        count += 1
+    yield "cursor", last_key if limit is not None and count == limit else None
+
+
+def fetch_graph_page(after=None, limit=DEFAULT_PAGE_SIZE):
+    """Reads one page of nodes and relationships; raises if Neo4j is not available."""
+    nodes = []
+    edges = []
+    next_cursor = None
+    for kind, item in iter_graph_records(after, limit):
+        if kind == "node":
+            nodes.append(item)
+        elif kind == "edge":
+            edges.append(item)
+        elif item is not None:
+            next_cursor = encode_cursor(item)
+    layout = summary_state["layout"]
+    return {"nodes": nodes, "edges": edges, "next_cursor": next_cursor,
+            "layout_version": None if layout is None else layout.version}
+
+
+def fetch_neighborhood(node_id, hops=1, types=None, limit=DEFAULT_NEIGHBOR_LIMIT):
+    """Reads the ``hops``-hop neighbourhood of a node breadth first; None if the node does not exist.
+
+    Each hop expands the nodes first reached on the previous hop, keeping
+    only their ``limit`` heaviest edges, so hubs cannot flood the response.
+    Nodes carry the ``hop`` at which they were reached; ``truncated`` tells
+    that ``MAX_NEIGHBORHOOD_NODES`` cut the expansion short.
+    """
+    root = backend.node_view(node_id)
+    if root is None:
+        return None
+    nodes = {root["id"]: dict(place_node(node_to_dict(root)), hop=0)}
+    edges = {}
+    frontier = [root["id"]]
+    truncated = False
+    for hop in range(1, hops + 1):
+        if not frontier or truncated:
+            break
+        reached = []
+        for record in backend.expand_nodes(frontier, types, limit):
+            if record["key"] in edges:
+                continue
+            new_nodes = [node for node in (record["n"], record["m"]) if node["id"] not in nodes]
+            if len(nodes) + len(new_nodes) > MAX_NEIGHBORHOOD_NODES:
+                truncated = True
+                continue
+            for node in new_nodes:
+                nodes[node["id"]] = dict(place_node(node_to_dict(node)), hop=hop)
+                reached.append(node["id"])
+            edges[record["key"]] = {"id": str(record["key"]), "from": record["n"]["id"], "to": record["m"]["id"],
+                                    "label": record["type"], "weight": record["weight"]}
+        frontier = reached
+    return {"root": root["id"], "nodes": list(nodes.values()), "edges": list(edges.values()),
+            "truncated": truncated}
+
+
+def fetch_paths(from_id, to_id, k=DEFAULT_PATHS, max_depth=DEFAULT_MAX_DEPTH, types=None):
+    """Finds up to ``k`` shortest paths between two nodes; None if either node does not exist.
+
+    The search runs on the in-memory adjacency snapshot (bidirectional BFS,
+    see ``path_finder``) when it holds both nodes and no write happened since
+    it was read; otherwise it falls back to the backend's ``shortest_paths``.
+    Either way it stops after ``PATH_TIME_BUDGET`` seconds and ``complete``
+    tells whether it finished.
+    """
+    deadline = time.monotonic() + PATH_TIME_BUDGET
+    snapshot = summary_state["paths"]
+    if (snapshot is not None and snapshot.generation == summary_state["generation"]
+            and from_id in snapshot and to_id in snapshot):
+        records, complete = snapshot.shortest_paths(from_id, to_id, k, max_depth, types, deadline)
+        source = "snapshot"
+    else:
+        if backend.node_view(from_id) is None or backend.node_view(to_id) is None:
+            return None
+        records, complete = backend.shortest_paths(from_id, to_id, k, max_depth, types,
+                                                   timeout=max(deadline - time.monotonic(), 0.1))
+        records = [dict(record, nodes=[node_to_dict(node) for node in record["nodes"]]) for record in records]
+        source = "database"
+    data = describe_paths(records)
+    data["nodes"] = [place_node(node) for node in data["nodes"]]
+    data.update({"from": from_id, "to": to_id, "complete": complete, "source": source})
+    return data
+
 
 def get_demo_data():
     """Returns demo data when Neo4j is not available"""
@@ -184,117 +520,6 @@ def get_demo_data():
         ]
     }
 
-def get_node_label(node):
-    """Get the appropriate label for a node based on its properties."""
-    # Try different possible label fields based on node type
-    if "title" in node:
-        label = node["title"]
-    elif "name" in node:
-        label = node["name"]
-    elif "term" in node:
-        label = node["term"]
-    elif "paper_id" in node:
-        label = node["paper_id"]
-    elif "author_id" in node:
-        label = node["author_id"]
-    elif "institution_id" in node:
-        label = node["institution_id"]
-    elif "keyword_id" in node:
-        label = node["keyword_id"]
-    elif "cell_type_id" in node:
-        label = node["cell_type_id"]
-    elif "gene_id" in node:
-        label = node["gene_id"]
-    elif "method_id" in node:
-        label = node["method_id"]
-    elif "material_id" in node:
-        label = node["material_id"]
-    elif "funder_id" in node:
-        label = node["funder_id"]
-    elif "mission_id" in node:
-        label = node["mission_id"]
-    else:
-        # Fallback: use the first available property
-        properties = dict(node)
-        if properties:
-            label = str(list(properties.values())[0])
-        else:
-            label = "Unnamed"
-    
-    # Truncate long labels to prevent node stretching
-    if len(label) > 50:
-        return label[:47] + "..."
-    return label
-
-def get_full_node_label(node):
-    """Get the full label for a node without truncation (for tooltips)."""
-    # Try different possible label fields based on node type
-    if "title" in node:
-        return node["title"]
-    elif "name" in node:
-        return node["name"]
-    elif "term" in node:
-        return node["term"]
-    elif "paper_id" in node:
-        return node["paper_id"]
-    elif "author_id" in node:
-        return node["author_id"]
-    elif "institution_id" in node:
-        return node["institution_id"]
-    elif "keyword_id" in node:
-        return node["keyword_id"]
-    elif "cell_type_id" in node:
-        return node["cell_type_id"]
-    elif "gene_id" in node:
-        return node["gene_id"]
-    elif "method_id" in node:
-        return node["method_id"]
-    elif "material_id" in node:
-        return node["material_id"]
-    elif "funder_id" in node:
-        return node["funder_id"]
-    elif "mission_id" in node:
-        return node["mission_id"]
-    else:
-        # Fallback: use the first available property
-        properties = dict(node)
-        if properties:
-            return str(list(properties.values())[0])
-        return "Unnamed"
-
-def get_article_group(node):
-    """Determine which article group a node belongs to based on its properties."""
-    # Check if this is a Paper node
-    if "paper_id" in node:
-        paper_id = node["paper_id"]
-        if "10.3390/cells10030560" in paper_id:
-            return "Células-Tronco Adiposas"
-        elif "10.1371/journal.pone.0183480" in paper_id:
-            return "Isolamento de RNA na ISS"
-        else:
-            return "Artigo Desconhecido"
-    
-    # For other nodes, we need to check their relationships to papers
-    # This is a simplified approach - in a real scenario, you'd query the relationships
-    # For now, we'll use a heuristic based on node properties
-    
-    # Check if node has properties that suggest it belongs to a specific article
-    if "name" in node:
-        name = node["name"].lower()
-        # Keywords and terms that are more specific to article 1 (adipose stem cells)
-        article1_keywords = ["adipose", "stem", "cell", "proliferation", "microgravity", "stirred", "microspheres"]
-        # Keywords and terms that are more specific to article 2 (RNA isolation, ISS)
-        article2_keywords = ["rna", "isolation", "pcr", "quantitative", "real", "time", "iss", "space", "station"]
-        
-        if any(keyword in name for keyword in article1_keywords):
-            return "Células-Tronco Adiposas"
-        elif any(keyword in name for keyword in article2_keywords):
-            return "Isolamento de RNA na ISS"
-    
-    # Default to shared/unknown for nodes that could belong to both articles
-    return "Conceitos Compartilhados"
-
-
 # --- WEB APPLICATION ROUTES (Endpoints) ---
 
 @app.route('/')
@@ -313,54 +538,470 @@ def systematic_review():
     return render_template('systematic_review.html')
 
 
+def payload_format():
+    """Negotiates the body format: the ``format`` parameter, else the ``Accept`` header.
+
+    "json" (the default), "columnar" (JSON with per-field arrays and a string
+    table, see ``graph_encoding``) and "msgpack" (the columnar payload in
+    msgpack, also chosen when ``Accept`` lists ``application/x-msgpack``
+    explicitly and ranks it above JSON) are cacheable formats; "ndjson"
+    streams. Raises ValueError for unknown formats.
+    """
+    fmt = request.args.get("format")
+    if fmt is None:
+        # JSON is listed first so wildcards ("*/*", browser and fetch defaults) keep it
+        best = request.accept_mimetypes.best_match(["application/json", "application/x-msgpack"],
+                                                   default="application/json")
+        return "msgpack" if best == "application/x-msgpack" else "json"
+    if fmt not in ("json", "ndjson", "columnar", "msgpack"):
+        raise ValueError("format must be 'json', 'ndjson', 'columnar' or 'msgpack'")
+    return fmt
+
+
+def parse_page_args():
+    """Reads the ``cursor``, ``limit`` and ``format`` query parameters.
+
+    Returns ``(after, limit, fmt)``; ``limit`` is None when the client did not
+    ask for a page size and ``fmt`` comes from ``payload_format``. Raises
+    ValueError for malformed values.
+    """
+    after = decode_cursor(request.args.get("cursor"))
+    limit = request.args.get("limit")
+    if limit is not None:
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, MAX_PAGE_SIZE)
+    return after, limit, payload_format()
+
+
+def cached_response(build, fmt=None):
+    """Serves ``build()`` through the response cache with ETag support.
+
+    The body is encoded in ``fmt`` (negotiated by ``payload_format`` when
+    omitted) and compressed with the best encoding the client accepts (brotli
+    or gzip). The cache key is the request path, its sorted query parameters,
+    the format, the content encoding and the current graph version, so each
+    variant is encoded and compressed once. Clients sending a matching
+    ``If-None-Match`` get a 304. Exceptions from ``build`` propagate and
+    nothing is cached.
+    """
+    fmt = fmt or payload_format()
+    if fmt == "ndjson":
+        fmt = "json"
+    encoding = request.accept_encodings.best_match(available_encodings()) or "identity"
+    key = response_cache.key(request.path, sorted(request.args.items(multi=True)) + [(fmt, encoding)])
+    entry = response_cache.get(key)
+    if entry is None:
+        body, _ = compress(encode_payload(build(), fmt, dumps=app.json.dumps), encoding)
+        entry = response_cache.put(key, body)
+    body, etag = entry
+    response = Response(body, mimetype=MIMETYPES[fmt])
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.vary.add("Accept")
+    response.set_etag(etag)
+    response.make_conditional(request)
+    if response.status_code == 304:
+        response_cache.count_not_modified()
+    return response
+
+
+def primed(records):
+    """Pulls the first record so that connection errors surface before streaming starts."""
+    first = next(records)
+    return itertools.chain([first], records)
+
+
+def ndjson_response(records):
+    """Streams ("kind", item) records as newline-delimited JSON objects."""
+    def generate():
+        for kind, item in records:
+            if kind == "cursor":
+                if item is not None:
+                    yield json.dumps({"type": "cursor", "next_cursor": encode_cursor(item)}) + "\n"
+            else:
+                yield json.dumps({"type": kind, **item}) + "\n"
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+def fetch_summary(zoom, community=None, limit=None):
+    """Reads one level of the community summary; None if the community does not exist."""
+    summary = summary_state["communities"] or refresh_summaries()["communities"]
+    if summary is None:
+        raise RuntimeError("the community summary is not available")
+    if zoom == 0:
+        return summary.coarse(limit)
+    data = summary.community(community)
+    if data is not None:
+        data["nodes"] = [place_node(node) for node in data["nodes"]]
+    return data
+
+
+def summary_response():
+    """Serves ``/api/data?zoom=``: 0 for the super-node graph, 1 with ``community`` for one community."""
+    try:
+        zoom = int(request.args["zoom"])
+        community = request.args.get("community")
+        community = int(community) if community is not None else None
+        limit = request.args.get("limit")
+        limit = min(int(limit), MAX_PAGE_SIZE) if limit is not None else None
+        if zoom not in (0, 1) or (zoom == 1 and community is None) or (limit is not None and limit < 1):
+            raise ValueError("invalid zoom parameters")
+    except ValueError:
+        return jsonify({"error": "zoom must be 0, or 1 with a 'community', and limit positive"}), 400
+    try:
+        fmt = payload_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        data = fetch_summary(zoom, community, limit)
+        if data is None:
+            raise LookupError(community)
+        return data
+
+    try:
+        return cached_response(build, fmt)
+    except LookupError:
+        return jsonify({"error": "Community not found"}), 404
+    except Exception as e:
+        print(f"Neo4j not available, returning demo data: {e}")
+        return jsonify(get_demo_data())
+
+
+def fetch_central_subgraph(limit, metric):
+    """Reads the ``limit`` most central nodes by ``metric`` and the edges among them."""
+    centrality = summary_state["centrality"] or refresh_summaries()["centrality"]
+    if centrality is None:
+        raise RuntimeError("the centrality scores are not available")
+    data = centrality.top_subgraph(limit, metric)
+    data["nodes"] = [place_node(node) for node in data["nodes"]]
+    return data
+
+
+def central_response():
+    """Serves ``/api/data?top=N``: the subgraph of the N most central nodes by ``rank``."""
+    metric = request.args.get("rank", "pagerank")
+    try:
+        limit = int(request.args["top"])
+        if limit < 1 or metric not in METRICS:
+            raise ValueError("invalid top parameters")
+    except ValueError:
+        return jsonify({"error": f"top must be positive and rank one of {', '.join(METRICS)}"}), 400
+    try:
+        fmt = payload_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return cached_response(lambda: fetch_central_subgraph(min(limit, MAX_PAGE_SIZE), metric), fmt)
+    except Exception as e:
+        print(f"Neo4j not available, returning demo data: {e}")
+        return jsonify(get_demo_data())
+
+
 @app.route('/api/data')
 def get_graph_data():
-    """API endpoint that returns the graph data for visualization."""
-    return jsonify(fetch_graph_data())
+    """API endpoint that returns the graph data for visualization.
+
+    Query parameters: ``limit`` (edges per page, default 100), ``cursor``
+    (the ``next_cursor`` of the previous page) and ``format=ndjson`` to
+    stream records as they are read. NDJSON without a ``limit`` walks the
+    whole graph in a single response. ``format=columnar`` or ``msgpack`` (or
+    ``Accept: application/x-msgpack``) selects the compact encodings of
+    ``graph_encoding``; every cached response is gzip/brotli compressed when
+    the client accepts it.
+
+    With ``zoom`` the graph is summarized by communities instead:
+    ``zoom=0`` returns one super-node per community (the ``limit`` largest)
+    and ``zoom=1&community=<id>`` the nodes and edges of one community.
+    With ``top=N`` it returns the N most central nodes and the edges among
+    them, ranked by ``rank`` (``pagerank``, ``degree`` or ``betweenness``).
+    """
+    if "zoom" in request.args:
+        return summary_response()
+    if "top" in request.args:
+        return central_response()
+    try:
+        after, limit, fmt = parse_page_args()
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    if fmt == "ndjson":
+        try:
+            records = primed(iter_graph_records(after, limit))
+        except Exception as e:
+            print(f"Neo4j not available: {e}")
+            return jsonify({"error": "Graph database not available"}), 503
+        return ndjson_response(records)
+
+    try:
+        return cached_response(lambda: fetch_graph_page(after, limit or DEFAULT_PAGE_SIZE), fmt)
+    except Exception as e:
+        print(f"Neo4j not available, returning demo data: {e}")
+        return jsonify(get_demo_data())
+
+
+@app.route('/api/node/<node_id>/neighbors')
+def get_node_neighbors(node_id):
+    """API endpoint that returns the neighbourhood of one node, to grow the graph view lazily.
+
+    Query parameters: ``hops`` (depth, default 1, at most 3), ``type`` (a
+    relationship type to follow; repeat it or separate types by commas) and
+    ``limit`` (edges kept per expanded node, heaviest first, default 25).
+    """
+    try:
+        hops = int(request.args.get("hops", 1))
+        limit = int(request.args.get("limit", DEFAULT_NEIGHBOR_LIMIT))
+        if not 1 <= hops <= MAX_NEIGHBOR_HOPS or limit < 1:
+            raise ValueError("hops or limit out of range")
+    except ValueError:
+        return jsonify({"error": f"hops must be between 1 and {MAX_NEIGHBOR_HOPS} and limit positive"}), 400
+    try:
+        fmt = payload_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    types = relationship_types()
+
+    def build():
+        neighborhood = fetch_neighborhood(node_id, hops, types, min(limit, MAX_NEIGHBOR_LIMIT))
+        if neighborhood is None:
+            raise LookupError(node_id)
+        return neighborhood
+
+    try:
+        return cached_response(build, fmt)
+    except LookupError:
+        return jsonify({"error": "Node not found"}), 404
+    except Exception as e:
+        print(f"Neo4j not available: {e}")
+        return jsonify({"error": "Graph database not available"}), 503
+
+
+@app.route('/api/path')
+def get_paths():
+    """API endpoint that returns the shortest paths connecting two nodes.
+
+    Query parameters: ``from`` and ``to`` (node ids), ``k`` (paths, default
+    3, at most 10), ``max_depth`` (edges per path, default 4, at most 6) and
+    ``type`` (relationship types to follow, as in the neighbours endpoint).
+    Paths are listed shortest first by their node and edge ids; each node and
+    edge appears once in ``nodes``/``edges``. ``complete`` is false when the
+    time budget ran out before all paths were found.
+    """
+    from_id, to_id = request.args.get("from"), request.args.get("to")
+    try:
+        k = int(request.args.get("k", DEFAULT_PATHS))
+        max_depth = int(request.args.get("max_depth", DEFAULT_MAX_DEPTH))
+        if not from_id or not to_id or from_id == to_id:
+            raise ValueError("from and to must be two different nodes")
+        if not 1 <= k <= MAX_PATHS or not 1 <= max_depth <= MAX_PATH_DEPTH:
+            raise ValueError("k or max_depth out of range")
+    except ValueError:
+        return jsonify({"error": f"from and to must be two different node ids, k between 1 and {MAX_PATHS} "
+                                 f"and max_depth between 1 and {MAX_PATH_DEPTH}"}), 400
+    try:
+        paths = fetch_paths(from_id, to_id, k, max_depth, relationship_types())
+    except Exception as e:
+        print(f"Neo4j not available: {e}")
+        return jsonify({"error": "Graph database not available"}), 503
+    if paths is None:
+        return jsonify({"error": "Node not found"}), 404
+    return jsonify(paths)
+
+
+def relationship_types():
+    """Reads the ``type`` query parameters (repeated or comma separated); None when absent."""
+    types = [t for value in request.args.getlist("type") for t in value.split(",") if t.strip()]
+    return [t.strip() for t in types] or None
+
+
+def demo_node_list():
+    """Returns the demo nodes in the /api/nodes format."""
+    demo_data = get_demo_data()
+    demo_nodes = []
+    for node in demo_data["nodes"]:
+        demo_nodes.append({
+            "name": node["label"],
+            "fullName": node["fullLabel"],
+            "id": node["id"],
+            "group": node["group"]
+        })
+    return demo_nodes
+
+
+def fetch_node_page(after=None, limit=DEFAULT_PAGE_SIZE):
+    """Reads one page of the node list; raises if Neo4j is not available."""
+    nodes = []
+    next_cursor = None
+    for kind, item in iter_node_records(after, limit):
+        if kind == "node":
+            nodes.append(item)
+        elif item is not None:
+            next_cursor = encode_cursor(item)
+    return {"nodes": nodes, "next_cursor": next_cursor}
 
 
 @app.route('/api/nodes')
 def get_node_list():
-    """API endpoint that returns a simplified list of all nodes."""
+    """API endpoint that returns a simplified list of all nodes.
+
+    Without parameters the whole list is streamed as a JSON array. With a
+    ``limit`` (and optional ``cursor``) one page is returned as
+    ``{"nodes": [...], "next_cursor": ...}``, and ``format=ndjson`` streams
+    one node per line. ``format=columnar`` and ``format=msgpack`` return the
+    page (or the whole list) in the compact encodings of ``graph_encoding``.
+    """
     try:
-        nodes = []
-        with driver.session(database="neo4j") as session:
-            # This query fetches all nodes with their properties
-            query = """
-            MATCH (n) 
-            RETURN n, elementId(n) AS id, labels(n)[0] AS group
-            ORDER BY id(n)
-            """
-            result = session.run(query)
-            # Convert the result into a list of dictionaries
-            for record in result:
-                node = record["n"]
-                label = get_node_label(node)
-                full_label = get_full_node_label(node)
-                nodes.append({
-                    "name": label,
-                    "fullName": full_label,
-                    "id": record["id"],
-                    "group": record["group"]
-                })
-        return jsonify(nodes)
+        after, limit, fmt = parse_page_args()
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    if fmt in ("columnar", "msgpack") or (fmt == "json" and limit is not None):
+        try:
+            return cached_response(lambda: fetch_node_page(after, limit), fmt)
+        except Exception as e:
+            print(f"Neo4j not available, returning demo node list: {e}")
+            return jsonify(demo_node_list())
+
+    try:
+        records = primed(iter_node_records(after, limit))
     except Exception as e:
         print(f"Neo4j not available, returning demo node list: {e}")
-        demo_data = get_demo_data()
-        demo_nodes = []
-        for node in demo_data["nodes"]:
-            demo_nodes.append({
-                "name": node["label"],
-                "fullName": node["fullLabel"],
-                "id": node["id"],
-                "group": node["group"]
-            })
-        return jsonify(demo_nodes)
+        return jsonify(demo_node_list())
+
+    if fmt == "ndjson":
+        return ndjson_response(records)
+
+    def generate():
+        # Stream the JSON array so the full list is never held in memory
+        yield "["
+        for index, (kind, item) in enumerate(records):
+            if kind == "node":
+                yield ("," if index else "") + json.dumps(item)
+        yield "]"
+    return Response(generate(), mimetype="application/json")
+
+
+@app.route('/api/ready')
+def get_readiness():
+    """Readiness endpoint: reports the database state and whether NLP workers are loaded.
+
+    Returns 200 once at least one ingestion worker has its model loaded and
+    503 before that; read endpoints are available in either case.
+    """
+    workers = jobs.status()
+    nlp_ready = workers["ready_workers"] > 0
+    body = {
+        "ready": nlp_ready,
+        "nlp": "ready" if nlp_ready else ("failed" if workers["error"] else
+                                          "loading" if workers["started"] else "not_started"),
+        "ingest_workers": workers,
+        **startup_state
+    }
+    return jsonify(body), 200 if nlp_ready else 503
+
+
+@app.route('/api/search')
+def search():
+    """API endpoint for ranked search over node labels, paper titles and the corpus titles.
+
+    ``q`` is the query and ``limit`` the number of results (default 20). The
+    last word of ``q`` is completed by prefix unless ``prefix=0``, and
+    ``type=node`` or ``type=publication`` restricts the results.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter 'q'"}), 400
+    try:
+        limit = int(request.args.get("limit", 20))
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    kind = request.args.get("type")
+    if kind not in (None, "node", "publication"):
+        return jsonify({"error": "type must be 'node' or 'publication'"}), 400
+
+    start = time.perf_counter()
+    results = search_index.search(query, limit=min(limit, MAX_SEARCH_RESULTS),
+                                  prefix=request.args.get("prefix", "1") != "0",
+                                  accept=(lambda payload: payload["kind"] == kind) if kind else None)
+    return jsonify({
+        "query": query,
+        "results": [dict(payload, score=round(score, 4)) for score, payload in results],
+        "took_ms": round((time.perf_counter() - start) * 1000, 3),
+    })
+
+
+@app.route('/api/similar')
+def similar():
+    """API endpoint returning the items closest to a node or publication by embedding similarity.
+
+    The item is given by ``id`` (a node id), ``publication`` (a PMC id from the
+    corpus CSV) or ``q`` (the best /api/search match). ``k`` is the number of
+    results (default 10) and ``type`` restricts them to ``node`` or ``publication``.
+    """
+    try:
+        k = int(request.args.get("k", 10))
+        if k < 1:
+            raise ValueError("k must be positive")
+    except ValueError:
+        return jsonify({"error": "Invalid k"}), 400
+    k = min(k, MAX_SIMILAR_RESULTS)
+    kind = request.args.get("type")
+    if kind not in (None, "node", "publication"):
+        return jsonify({"error": "type must be 'node' or 'publication'"}), 400
+
+    start = time.perf_counter()
+    if request.args.get("id"):
+        key = "node:" + request.args["id"]
+    elif request.args.get("publication"):
+        key = "publication:" + request.args["publication"].upper()
+    elif request.args.get("q"):
+        hits = search_index.search(request.args["q"], limit=1)
+        if not hits:
+            return jsonify({"error": "No item matches the query"}), 404
+        key = f"{hits[0][1]['kind']}:{hits[0][1]['id']}"
+    else:
+        return jsonify({"error": "Give one of 'id', 'publication' or 'q'"}), 400
+
+    item = search_index.get(key)
+    vector = vector_index.vector(key)
+    if item is None or vector is None:
+        return jsonify({"error": "No embedding for this item yet"}), 404
+
+    # Widen the candidate list until the item itself, stale keys and the type filter are made up for
+    wanted = k + 1
+    while True:
+        results = []
+        for doc_id, score in vector_index.search(vector, k=wanted)[0]:
+            payload = search_index.get(doc_id)
+            if doc_id == key or payload is None or (kind and payload["kind"] != kind):
+                continue
+            results.append(dict(payload, score=round(score, 4)))
+            if len(results) == k:
+                break
+        if len(results) == k or wanted >= len(vector_index):
+            break
+        wanted *= 4
+    return jsonify({
+        "item": item,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3),
+    })
+
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """API endpoint that reports the response cache version and hit/miss counters."""
+    return jsonify(response_cache.stats())
 
 
 @app.route('/upload', methods=['POST'])
 def upload_and_process_pdf():
-    """Endpoint to receive the PDF upload and execute the full pipeline."""
+    """Endpoint to receive the PDF upload and queue it for background processing."""
     if 'pdf_file' not in request.files:
         return jsonify({"error": "No file sent"}), 400
 
@@ -368,24 +1009,127 @@ def upload_and_process_pdf():
     if file.filename == '':
         return jsonify({"error": "Empty filename"}), 400
 
-    if file and file.filename.endswith('.pdf'):
-        # Save the file to the 'uploads' folder
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        file.save(filepath)
-
-        # --- Execute the full pipeline ---
-        text = extract_content_from_pdf(filepath)
-        if text:
-            entities, relationships = process_text_to_graph(text)
-            if entities:
-                load_data_into_neo4j(entities, relationships)
-                return jsonify({
-                    "message": f"File '{file.filename}' processed successfully!",
-                    "entities_found": len(entities),
-                    "relationships_found": len(relationships)
-                })
+    if not file.filename.endswith('.pdf'):
+        return jsonify({"error": "Invalid file, only PDFs are accepted"}), 400
+
+    # Save the file to the 'uploads' folder under the hash of its contents
+    filepath, sha256 = store_upload(file.stream, app.config['UPLOAD_FOLDER'])
+
+    # --- Queue the full pipeline ---
+    try:
+        job_id = jobs.submit(filepath, file.filename, sha256)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+
+    return jsonify({
+        "message": f"File '{file.filename}' queued for processing.",
+        "sha256": sha256,
+        "job_id": job_id,
+        "status_url": f"/api/jobs/{job_id}"
+    }), 202
+
+
+def store_batch_files(files):
+    """Saves the PDFs of a batch upload, expanding ZIP archives; returns ``(documents, skipped)``.
+
+    ``documents`` are ``(path, filename, sha256)`` tuples and ``skipped`` the
+    ``{"filename", "reason"}`` of everything else. ZIP members are
+    decompressed straight from the archive to the uploads folder, one
+    block at a time.
+    """
+    documents = []
+    skipped = []
+
+    def add(stream, filename):
+        if len(documents) >= MAX_BATCH_FILES:
+            skipped.append({"filename": filename, "reason": f"more than {MAX_BATCH_FILES} PDFs in the batch"})
+            return
+        filepath, sha256 = store_upload(stream, app.config['UPLOAD_FOLDER'])
+        documents.append((filepath, filename, sha256))
+
+    for file in files:
+        name = file.filename or ""
+        if name.lower().endswith('.pdf'):
+            add(file.stream, name)
+        elif name.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except zipfile.BadZipFile:
+                skipped.append({"filename": name, "reason": "not a valid ZIP archive"})
+                continue
+            with archive:
+                for info in archive.infolist():
+                    member = os.path.basename(info.filename)
+                    if info.is_dir() or info.filename.startswith("__MACOSX/") or member.startswith("."):
+                        continue
+                    label = f"{name}/{info.filename}"
+                    if not member.lower().endswith('.pdf'):
+                        skipped.append({"filename": label, "reason": "not a PDF"})
+                    elif info.file_size > MAX_BATCH_MEMBER_BYTES:
+                        skipped.append({"filename": label, "reason": "file too large"})
+                    else:
+                        try:
+                            with archive.open(info) as stream:
+                                add(stream, member)
+                        except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+                            skipped.append({"filename": label, "reason": f"could not be extracted: {e}"})
+        else:
+            skipped.append({"filename": name, "reason": "only PDFs and ZIP archives are accepted"})
+    return documents, skipped
+
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Endpoint to receive many PDFs (``pdf_files``, repeated) or ZIP archives of PDFs as one batch.
+
+    The documents go through the same ingestion jobs as ``/upload``, at most
+    ``parallelism`` at a time (default and maximum ``BATCH_PARALLELISM``).
+    The aggregate report, with per-file counts and timings, is served at
+    ``/api/batches/<batch_id>``.
+    """
+    files = [file for file in request.files.getlist('pdf_files') if file.filename]
+    if not files:
+        return jsonify({"error": "No file sent"}), 400
+    try:
+        parallelism = int(request.values.get("parallelism", BATCH_PARALLELISM))
+        if parallelism < 1:
+            raise ValueError("parallelism must be positive")
+    except ValueError:
+        return jsonify({"error": "parallelism must be a positive integer"}), 400
+
+    documents, skipped = store_batch_files(files)
+    if not documents:
+        return jsonify({"error": "No PDF found in the upload", "skipped": skipped}), 400
+    try:
+        batch_id = jobs.submit_batch(documents, min(parallelism, BATCH_PARALLELISM), skipped)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+
+    return jsonify({
+        "message": f"{len(documents)} files queued for processing.",
+        "batch_id": batch_id,
+        "files": len(documents),
+        "skipped": skipped,
+        "status_url": f"/api/batches/{batch_id}"
+    }), 202
+
+
+@app.route('/api/batches/<batch_id>')
+def get_batch_status(batch_id):
+    """API endpoint that reports the aggregate progress, counts and timings of a batch upload."""
+    batch = jobs.get_batch(batch_id)
+    if batch is None:
+        return jsonify({"error": "Unknown batch"}), 404
+    return jsonify(batch)
+
 
-    return jsonify({"error": "Processing failed or invalid file"}), 500
+@app.route('/api/jobs/<job_id>')
+def get_job_status(job_id):
+    """API endpoint that reports the stage, progress and timings of an ingestion job."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
 
 
 # --- SERVER INITIALIZATION ---
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of the SB_publication_PMC.csv corpus into Neo4j.
+
+Each CSV row is matched to a PDF or text file in a local mirror directory,
+either by its PMC id (PMC4136787.pdf) or by a slug of its title. Extraction
+and NLP run in a pool of worker processes while the main process writes the
+finished papers to the graph, and every written paper is appended to a
+checkpoint file so an interrupted run resumes where it stopped.
+
+Usage:
+    python bulk_ingest.py --mirror /data/pmc --workers 8
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from neo4j import GraphDatabase
+
+from document_pipeline import (NLP_MODEL_NAME, extraction_fingerprint, iter_pages, load_nlp_model,
+                               process_pages_to_graph, split_text_into_chunks)
+from graph_schema import SchemaManager
+from graph_writer import DEFAULT_BATCH_SIZE, is_document_loaded, mark_document_loaded, write_graph
+from provenance import update_article_groups
+from result_cache import ResultCache, sha256_of_file
+
+# Neo4j settings
+URI = "bolt://localhost:7687"
+AUTH = ("neo4j", "12345678")
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+PMC_ID_PATTERN = re.compile(r"PMC\d+", re.IGNORECASE)
+
+
+def slugify(text):
+    """Lower-cases ``text`` and collapses everything but letters and digits to dashes."""
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def read_corpus(csv_path):
+    """Returns the CSV rows as dicts with ``key``, ``title`` and ``link``."""
+    papers = []
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            title = (row.get("Title") or "").strip()
+            link = (row.get("Link") or "").strip()
+            match = PMC_ID_PATTERN.search(link)
+            key = match.group(0).upper() if match else slugify(title)
+            if key:
+                papers.append({"key": key, "title": title, "link": link})
+    return papers
+
+
+def index_mirror(mirror_dir):
+    """Maps lower-cased file stems in the mirror to paths, preferring PDFs over text."""
+    index = {}
+    for root, _, files in os.walk(mirror_dir):
+        for name in files:
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            key = stem.lower()
+            if key not in index or ext.lower() == ".pdf":
+                index[key] = os.path.join(root, name)
+    return index
+
+
+def match_paper(paper, index):
+    """Returns the mirror file for a paper, by PMC id first and title slug second."""
+    return index.get(paper["key"].lower()) or index.get(slugify(paper["title"]))
+
+
+def load_checkpoint(path):
+    """Returns the keys of the papers already written by previous runs."""
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["key"])
+                except (ValueError, KeyError):
+                    continue
+    return done
+
+
+def append_checkpoint(path, entry):
+    """Appends one finished paper to the checkpoint file and flushes it to disk."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# --- WORKER PROCESSES (extraction + NLP) ---
+
+_worker = {}
+
+
+def _init_worker(model_name, cache_dir):
+    _worker["nlp"] = load_nlp_model(model_name)
+    _worker["cache"] = None
+    if cache_dir:
+        _worker["cache"] = ResultCache(cache_dir, fingerprint=extraction_fingerprint(_worker["nlp"], model_name))
+
+
+def _process_paper(paper, path):
+    """Extracts and analyses one paper, using the result cache when possible."""
+    start = time.perf_counter()
+    sha256 = sha256_of_file(path)
+    cache = _worker["cache"]
+    cached = cache.get(sha256) if cache is not None else None
+    report = {}
+    if cached is not None:
+        entities, relationships = cached
+    else:
+        # Settings changed since the graph was cached: reuse the extracted text
+        pages = cache.get_pages(sha256) if cache is not None else None
+        if pages is None:
+            if path.lower().endswith(".pdf"):
+                pages = iter_pages(path)
+            else:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    pages = split_text_into_chunks(f.read())
+            if cache is not None:
+                pages = cache.tee_pages(sha256, pages)
+        entities, relationships = process_pages_to_graph(pages, nlp=_worker["nlp"], report=report)
+        if cache is not None:
+            cache.put(sha256, entities, relationships)
+    return {
+        "paper": paper,
+        "path": path,
+        "sha256": sha256,
+        "entities": entities,
+        "relationships": relationships,
+        "cached": cached is not None,
+        "canonicalization": report,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+# --- MAIN PROCESS (graph writes, checkpoint, progress) ---
+
+def _report_progress(done, total, started):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed * 60 if elapsed else 0.0
+    remaining = (total - done) / rate if rate else 0.0
+    print(f"[INFO] {done}/{total} papers | {rate:.1f} papers/min | "
+          f"~{remaining:.1f} min remaining")
+    return rate
+
+
+def run(args):
+    papers = read_corpus(args.csv)
+    index = index_mirror(args.mirror)
+    done = load_checkpoint(args.checkpoint)
+
+    todo = []
+    missing = 0
+    for paper in papers:
+        if paper["key"] in done:
+            continue
+        path = match_paper(paper, index)
+        if path is None:
+            missing += 1
+            continue
+        todo.append((paper, path))
+    if args.limit:
+        todo = todo[:args.limit]
+
+    print(f"[INFO] {len(papers)} papers in the CSV, {len(done)} already loaded, "
+          f"{missing} without a file in the mirror, {len(todo)} to process")
+    if not todo:
+        return
+
+    driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    schema = SchemaManager(driver)
+    schema.ensure_known()
+    context = multiprocessing.get_context("spawn")
+    written = failed = 0
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(args.model, args.cache_dir)) as pool:
+            queue = iter(todo)
+            # future -> (paper, path), so failures can name the paper
+            in_flight = {}
+            while True:
+                # Keep a bounded number of papers in flight so results never pile up
+                while len(in_flight) < args.workers * 2:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    in_flight[pool.submit(_process_paper, *item)] = item
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    paper, path = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                        if not is_document_loaded(driver, result["sha256"]):
+                            write_start = time.perf_counter()
+                            write_graph(driver, result["entities"], result["relationships"],
+                                        batch_size=args.batch_size, schema=schema,
+                                        document=result["sha256"])
+                            mark_document_loaded(driver, result["sha256"],
+                                                 os.path.basename(result["path"]),
+                                                 properties={"pmc_id": paper["key"],
+                                                             "title": paper["title"],
+                                                             "link": paper["link"]})
+                            update_article_groups(driver, result["sha256"], batch_size=args.batch_size)
+                            result["write_seconds"] = round(time.perf_counter() - write_start, 4)
+                    except Exception as e:
+                        failed += 1
+                        print(f"[ERROR] Failed to process {paper['key']} \"{paper['title']}\" "
+                              f"({paper['link'] or path}): {e}")
+                        continue
+                    append_checkpoint(args.checkpoint, {
+                        "key": paper["key"],
+                        "sha256": result["sha256"],
+                        "entities": len(result["entities"]),
+                        "relationships": len(result["relationships"]),
+                        "cached": result["cached"],
+                        "entities_merged": (result["canonicalization"].get("entities_before", 0)
+                                            - result["canonicalization"].get("entities_after", 0)),
+                        "nlp_seconds": result["seconds"],
+                        "write_seconds": result.get("write_seconds", 0.0),
+                    })
+                    written += 1
+                    if written % args.report_every == 0:
+                        _report_progress(written, len(todo), started)
+    finally:
+        driver.close()
+
+    rate = _report_progress(written, len(todo), started)
+    print(f"[SUCCESS] {written} papers loaded, {failed} failures, {rate:.1f} papers/min")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk ingestion of the PMC corpus into Neo4j. Requires a running Neo4j server: "
+                    "the embedded graph backend (GRAPH_BACKEND=embedded) is not supported.")
+    parser.add_argument("--csv", default="SB_publication_PMC.csv", help="corpus CSV (Title, Link)")
+    parser.add_argument("--mirror", required=True, help="directory with the PDFs or text files")
+    parser.add_argument("--checkpoint", default="bulk_ingest.checkpoint.jsonl",
+                        help="file recording the papers already written")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="extraction/NLP worker processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per UNWIND batch when writing to Neo4j")
+    parser.add_argument("--cache-dir", default="cache", help="result cache directory ('' disables it)")
+    parser.add_argument("--model", default=NLP_MODEL_NAME, help="spaCy model name")
+    parser.add_argument("--limit", type=int, default=0, help="process at most this many papers")
+    parser.add_argument("--report-every", type=int, default=10, help="papers between progress lines")
+    parser.add_argument("--uri", default=URI)
+    parser.add_argument("--user", default=AUTH[0])
+    parser.add_argument("--password", default=AUTH[1])
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Merging of duplicate entities before they are written to the graph.
+
+spaCy returns entity text as written, so "ISS", "the ISS" and "International
+Space Station", or "stem cell" and "stem cells", would become separate
+nodes. ``canonicalize`` groups such variants in two cheap blocking passes and
+merges each group into one canonical entity that keeps the other spellings as
+``aliases``:
+
+* entities with the same label and normalized key (lower case, punctuation
+  and a leading article removed, a lower-case last word singularized) are
+  candidates: variants that differ only in case, punctuation or article are
+  merged directly, while singular and plural forms are only merged when the
+  cosine similarity of their word vectors reaches ``threshold``. Blocks are
+  per label, so "Washington" as PERSON and as GPE stay apart;
+* an acronym ("ISS") and a multi-word name whose initials spell it
+  ("International Space Station") are merged under the same vector check.
+
+Only pairs inside a block are compared, so the cost is linear in the number
+of entities plus the (small) blocks that need vectors. Relationships are
+remapped onto the canonical entities, in ``ordered_endpoints`` order:
+parallel edges are combined (counts added, the highest PMI kept) and edges
+between two variants of the same entity dropped.
+"""
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from cooccurrence import ordered_endpoints
+
+DEFAULT_SIMILARITY = 0.6
+# Bumped whenever the merge rules change, so cached extraction results are redone
+RULES_VERSION = 3
+LEADING_ARTICLES = ("the", "a", "an")
+# Words skipped when building the initials of a multi-word name
+ACRONYM_STOPWORDS = {"of", "the", "and", "for", "in", "on", "at", "to", "de", "da", "do"}
+
+_SPACES = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[\W_]+")
+_TRIM = "\"'`“”‘’.,;:()[]{} "
+
+
+def clean_entity_text(text):
+    """Returns the display form of an entity: trimmed, single-spaced, without a leading article or trailing 's."""
+    text = _SPACES.sub(" ", text).strip(_TRIM)
+    words = text.split(" ")
+    if len(words) > 1 and words[0].lower() in LEADING_ARTICLES:
+        text = " ".join(words[1:])
+    for suffix in ("'s", "’s"):
+        if text.endswith(suffix):
+            text = text[:-len(suffix)]
+    return text.strip(_TRIM)
+
+
+def singularize(word):
+    """Strips a regular English plural ending ("cells" -> "cell", "studies" -> "study").
+
+    Only lower-case words are treated as common nouns; capitalized and
+    upper-case words ("Mars", "Gauss", "NASA") are names and kept as they are.
+    """
+    if len(word) <= 3 or not word.islower() or not word.endswith("s") or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes")):
+        return word[:-2]
+    return word[:-1]
+
+
+def surface_key(text):
+    """Key shared by case, punctuation and article variants of a name."""
+    return " ".join(word for word in _NON_WORD.split(clean_entity_text(text).lower()) if word)
+
+
+def normalized_key(text):
+    """Blocking key that also joins plural variants of a common noun (lower-case last word)."""
+    words = [word for word in _NON_WORD.split(clean_entity_text(text)) if word]
+    if words:
+        words[-1] = singularize(words[-1])
+    return " ".join(words).lower()
+
+
+def is_acronym(text):
+    text = clean_entity_text(text)
+    return 2 <= len(text) <= 8 and " " not in text and text.isupper()
+
+
+def acronym_key(text):
+    """Lower-case acronym of a multi-word name ("International Space Station" -> "iss"), or None."""
+    words = [word for word in _NON_WORD.split(clean_entity_text(text)) if word]
+    initials = [word[0] for word in words if word.lower() not in ACRONYM_STOPWORDS and word[0].isalpha()]
+    if len(words) < 2 or len(initials) < 2:
+        return None
+    return "".join(initials).lower()
+
+
+def _canonical_member(members, counts=None):
+    """Picks the most descriptive spelling of a group.
+
+    Most words first, so a multi-word expansion beats its acronym, then
+    already clean and singular spellings. Among the case variants of one
+    word an acronym spelling wins ("NASA" over "nasa"), then the most
+    frequent one in ``counts`` and finally one that is not all lower case.
+    """
+    counts = counts or {}
+
+    def rank(entity):
+        cleaned = clean_entity_text(entity[0])
+        last_word = cleaned.split(" ")[-1]
+        return (-len(cleaned.split(" ")), cleaned != entity[0], singularize(last_word) != last_word,
+                not is_acronym(cleaned), -counts.get(entity, 0), cleaned.islower(), entity[0])
+    return min(members, key=rank)
+
+
+def canonicalize(entities, relationships, vectors=None, threshold=DEFAULT_SIMILARITY, counts=None):
+    """Merges duplicate entities and returns ``(entities, relationships, report)``.
+
+    ``entities`` is an iterable of ``(name, label)``; ``relationships`` a set of
+    ``(ent1, type, ent2)`` triples or a dict mapping them to ``count``/``pmi``.
+    ``vectors(texts)`` returns one embedding row per text and is only called
+    for plural and acronym candidates; without it those are never merged.
+    ``counts`` maps an entity to how often it was seen and breaks ties
+    between spellings (see ``_canonical_member``).
+
+    The returned entities map each canonical ``(name, label)`` to
+    ``{"aliases": [...]}`` (``{}`` when nothing was merged into it) and the
+    relationships are a weighted dict. The label of a merged entity is the
+    most common label among its variants; groups that end up with the same
+    name and label share one entity and pool their aliases.
+    """
+    entities = list(dict.fromkeys(entities))
+    parent = list(range(len(entities)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    # Pass 1: identical label and normalized key. Equal surface keys merge
+    # directly; the plural variants of a block become pairs to confirm with vectors.
+    blocks = defaultdict(dict)
+    for index, (name, label) in enumerate(entities):
+        key = normalized_key(name)
+        if not key:
+            continue
+        first = blocks[(label, key)].setdefault(surface_key(name), index)
+        if first != index:
+            union(first, index)
+    pairs = []
+    for variants in blocks.values():
+        firsts = list(variants.values())
+        pairs += [(a, b) for i, a in enumerate(firsts) for b in firsts[i + 1:]]
+
+    # Pass 2: acronyms against the multi-word names they abbreviate
+    acronyms = defaultdict(list)
+    expansions = defaultdict(list)
+    for index, (name, _) in enumerate(entities):
+        if is_acronym(name):
+            acronyms[clean_entity_text(name).lower()].append(index)
+        else:
+            key = acronym_key(name)
+            if key:
+                expansions[key].append(index)
+    pairs += [(a, e) for key, members in acronyms.items() for a in members for e in expansions.get(key, ())]
+    if pairs and vectors is not None:
+        texts = sorted({clean_entity_text(entities[i][0]) for pair in pairs for i in pair})
+        matrix = np.asarray(vectors(texts), dtype=np.float32)
+        if matrix.ndim == 2 and matrix.shape[1]:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+            rows = {text: row for row, text in enumerate(texts)}
+            for a, e in pairs:
+                va = matrix[rows[clean_entity_text(entities[a][0])]]
+                ve = matrix[rows[clean_entity_text(entities[e][0])]]
+                if va.any() and ve.any() and float(va @ ve) >= threshold:
+                    union(a, e)
+
+    clusters = defaultdict(list)
+    for index, entity in enumerate(entities):
+        clusters[find(index)].append(entity)
+    mapping = {}
+    spellings = defaultdict(set)
+    for members in clusters.values():
+        chosen = _canonical_member(members, counts)
+        labels = Counter(label for _, label in members)
+        label = max(labels, key=lambda candidate: (labels[candidate], candidate == chosen[1]))
+        canonical = (clean_entity_text(chosen[0]) or chosen[0], label)
+        spellings[canonical].update(name for name, _ in members)
+        for member in members:
+            mapping[member] = canonical
+    canonical_entities = {}
+    for canonical, names in spellings.items():
+        aliases = names - {canonical[0]}
+        canonical_entities[canonical] = {"aliases": sorted(aliases)} if aliases else {}
+
+    weights = relationships if isinstance(relationships, dict) else {}
+    canonical_relationships = {}
+    for (ent1, rel_type, ent2) in relationships:
+        start, end = ordered_endpoints(mapping.get(ent1, ent1), mapping.get(ent2, ent2))
+        if start == end:
+            continue
+        key = (start, rel_type, end)
+        weight = weights.get((ent1, rel_type, ent2)) or {}
+        merged = canonical_relationships.setdefault(key, {"count": 0, "pmi": None})
+        merged["count"] += weight.get("count", 1)
+        pmi = weight.get("pmi")
+        if pmi is not None and (merged["pmi"] is None or pmi > merged["pmi"]):
+            merged["pmi"] = pmi
+
+    report = {
+        "entities_before": len(entities),
+        "entities_after": len(canonical_entities),
+        "relationships_before": len(relationships),
+        "relationships_after": len(canonical_relationships),
+    }
+    return canonical_entities, canonical_relationships, report
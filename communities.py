@@ -0,0 +1,179 @@
+"""Community detection and the level-of-detail summary behind ``/api/data?zoom=``.
+
+Once many papers are ingested the graph has far more nodes than the
+visualization can draw. ``CommunitySummary.build`` runs weighted label
+propagation over the edges (each node repeatedly takes the label with the
+largest total edge weight among its neighbours, until no label changes) and
+aggregates the result into two tables:
+
+* super-nodes, one per community, labelled after its most connected member;
+* super-edges, one per pair of linked communities, with the number and total
+  weight of the edges between them.
+
+Zoom level 0 serves those tables; level 1 serves one community: its members,
+the edges inside it and its members' edges to the other communities, folded
+onto their super-nodes so the client can keep the rest of the view coarse.
+Label propagation is near-linear in the number of edges, so the summary is
+simply rebuilt after each write.
+"""
+import random
+import time
+from collections import Counter, defaultdict
+
+COMMUNITY_GROUP = "Community"
+MAX_ITERATIONS = 20
+
+
+def community_node_id(community):
+    return f"community:{community}"
+
+
+def label_propagation(adjacency, max_iterations=MAX_ITERATIONS, seed=0):
+    """Returns one community label per node of ``adjacency`` (lists of ``(neighbour, weight)``).
+
+    Nodes are visited in a shuffled order (fixed by ``seed``, so results are
+    reproducible) and updated in place. Ties keep the current label when it
+    is among the best, otherwise the smallest label wins.
+    """
+    labels = list(range(len(adjacency)))
+    order = [node for node in range(len(adjacency)) if adjacency[node]]
+    shuffle = random.Random(seed).shuffle
+    for _ in range(max_iterations):
+        shuffle(order)
+        changed = False
+        for node in order:
+            scores = defaultdict(float)
+            for neighbour, weight in adjacency[node]:
+                scores[labels[neighbour]] += weight
+            best = max(scores.values())
+            current = labels[node]
+            if scores.get(current) == best:
+                continue
+            labels[node] = min(label for label, score in scores.items() if score == best)
+            changed = True
+        if not changed:
+            break
+    return labels
+
+
+class CommunitySummary:
+    """Super-node and super-edge tables of one community partition of the graph."""
+
+    def __init__(self, views, node_community, edges):
+        self.views = views
+        self.node_community = node_community
+        self.built_at = time.time()
+        self._members = defaultdict(list)
+        for node_id, community in node_community.items():
+            self._members[community].append(node_id)
+
+        degree = Counter()
+        self._inner_edges = defaultdict(list)
+        self._outer_edges = defaultdict(Counter)
+        links = defaultdict(lambda: [0, 0])
+        for edge in edges:
+            start, end = edge["from"], edge["to"]
+            degree[start] += edge["weight"]
+            degree[end] += edge["weight"]
+            a, b = node_community[start], node_community[end]
+            if a == b:
+                self._inner_edges[a].append(edge)
+                continue
+            self._outer_edges[a][(start, b)] += edge["weight"]
+            self._outer_edges[b][(end, a)] += edge["weight"]
+            link = links[(min(a, b), max(a, b))]
+            link[0] += 1
+            link[1] += edge["weight"]
+
+        self.super_nodes = []
+        for community, members in sorted(self._members.items(), key=lambda item: (-len(item[1]), item[0])):
+            members.sort(key=lambda node_id: (-degree[node_id], node_id))
+            hub = views[members[0]]
+            groups = Counter(views[node_id].get("articleGroup") for node_id in members)
+            top_labels = ", ".join(views[node_id]["label"] for node_id in members[:3])
+            self.super_nodes.append({
+                "id": community_node_id(community),
+                "label": f"{hub['label']} (+{len(members) - 1})" if len(members) > 1 else hub["label"],
+                "fullLabel": top_labels,
+                "group": COMMUNITY_GROUP,
+                "articleGroup": groups.most_common(1)[0][0],
+                "community": community,
+                "size": len(members),
+                "value": len(members),
+            })
+        self.super_edges = [
+            {"from": community_node_id(a), "to": community_node_id(b), "count": count, "weight": weight,
+             "value": count}
+            for (a, b), (count, weight) in sorted(links.items())
+        ]
+
+    @classmethod
+    def build(cls, edge_records, seed=0):
+        """Partitions the graph read from ``edge_records`` (see ``GraphBackend.iter_edges``)."""
+        index = {}
+        views = []
+        adjacency = []
+        edges = []
+
+        def node_index(view):
+            position = index.get(view["id"])
+            if position is None:
+                position = index[view["id"]] = len(views)
+                views.append(view)
+                adjacency.append([])
+            return position
+
+        for record in edge_records:
+            start, end = node_index(record["n"]), node_index(record["m"])
+            weight = record.get("weight") or 1
+            if start != end:
+                adjacency[start].append((end, weight))
+                adjacency[end].append((start, weight))
+            edges.append({"from": record["n"]["id"], "to": record["m"]["id"],
+                          "label": record["type"], "weight": weight})
+
+        labels = label_propagation(adjacency, seed=seed)
+        # Number communities by decreasing size, so ids are small and stable for a given graph
+        sizes = Counter(labels)
+        numbering = {label: number for number, (label, _) in
+                     enumerate(sorted(sizes.items(), key=lambda item: (-item[1], item[0])))}
+        node_community = {view["id"]: numbering[label] for view, label in zip(views, labels)}
+        return cls({view["id"]: view for view in views}, node_community, edges)
+
+    def __len__(self):
+        return len(self.super_nodes)
+
+    def place(self, positions):
+        """Puts each super-node at the centre of its members' positions (``{node id: (x, y)}``)."""
+        for node in self.super_nodes:
+            placed = [positions[node_id] for node_id in self._members[node["community"]] if node_id in positions]
+            if placed:
+                node["x"] = round(sum(x for x, _ in placed) / len(placed), 1)
+                node["y"] = round(sum(y for _, y in placed) / len(placed), 1)
+
+    def coarse(self, limit=None):
+        """Zoom level 0: the ``limit`` largest communities and the super-edges between them."""
+        nodes = self.super_nodes[:limit] if limit is not None else self.super_nodes
+        shown = {node["id"] for node in nodes}
+        return {
+            "zoom": 0,
+            "nodes": nodes,
+            "edges": [edge for edge in self.super_edges if edge["from"] in shown and edge["to"] in shown],
+            "communities": len(self.super_nodes),
+        }
+
+    def community(self, community):
+        """Zoom level 1: one community's members and edges, or None if it does not exist."""
+        members = self._members.get(community)
+        if members is None:
+            return None
+        outer = [
+            {"from": node_id, "to": community_node_id(other), "weight": weight, "value": weight}
+            for (node_id, other), weight in sorted(self._outer_edges[community].items())
+        ]
+        return {
+            "zoom": 1,
+            "community": community,
+            "nodes": [dict(self.views[node_id], community=community) for node_id in members],
+            "edges": self._inner_edges[community] + outer,
+        }
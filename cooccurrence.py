@@ -0,0 +1,112 @@
+"""Windowed entity co-occurrence counting.
+
+Entities are interned to integer ids and pairs are counted as packed
+``(low_id << 32) | high_id`` integers, so counting a document costs one
+dictionary update per co-occurring pair instead of a tuple of strings per
+pair. Edges carry the number of windows in which the pair co-occurred and a
+pointwise mutual information score, and pairs below a minimum support are
+dropped before anything is written. Co-occurrence has no direction: every
+edge runs from the endpoint that sorts first by ``(label, name)``, so the
+same pair always maps to the same edge whichever document it came from.
+"""
+import math
+from collections import Counter, deque
+
+PAIR_SHIFT = 32
+PAIR_MASK = (1 << PAIR_SHIFT) - 1
+
+
+def ordered_endpoints(ent1, ent2):
+    """Returns two ``(name, label)`` entities in canonical edge order, by ``(label, name)``."""
+    if (ent2[1], ent2[0]) < (ent1[1], ent1[0]):
+        return ent2, ent1
+    return ent1, ent2
+
+
+class CooccurrenceCounter:
+    """Counts entity pairs that appear within ``window`` sentences or tokens of each other.
+
+    In "sentence" mode each sentence is one unit and an entity pairs with the
+    entities of the same sentence and of the ``window - 1`` sentences before
+    it; ``window=1`` reproduces the old same-sentence pairs. In "token" mode
+    each entity mention is one unit and pairs with the mentions that start at
+    most ``window`` tokens after it ends. Windows never span two docs.
+    """
+
+    def __init__(self, window=1, unit="sentence"):
+        if unit not in ("sentence", "token"):
+            raise ValueError(f"Unknown co-occurrence unit: {unit}")
+        self.window = max(1, int(window))
+        self.unit = unit
+        self.entities = []
+        self._ids = {}
+        self.entity_counts = Counter()
+        self.pair_counts = Counter()
+        self.units = 0
+        self._recent = deque(maxlen=self.window - 1) if self.window > 1 else None
+
+    def intern(self, entity):
+        """Returns the integer id of an entity, assigning the next one on first sight."""
+        entity_id = self._ids.get(entity)
+        if entity_id is None:
+            entity_id = len(self.entities)
+            self._ids[entity] = entity_id
+            self.entities.append(entity)
+        return entity_id
+
+    def _count_pairs(self, left, right):
+        pairs = set()
+        for a in left:
+            for b in right:
+                if a != b:
+                    pairs.add((a << PAIR_SHIFT) | b if a < b else (b << PAIR_SHIFT) | a)
+        self.pair_counts.update(pairs)
+
+    def add_doc(self, doc):
+        """Counts the entities and co-occurring pairs of a spaCy ``Doc``."""
+        if self.unit == "sentence":
+            if self._recent is not None:
+                self._recent.clear()
+            for sent in doc.sents:
+                ids = {self.intern((ent.text.strip(), ent.label_)) for ent in sent.ents}
+                self.units += 1
+                self.entity_counts.update(ids)
+                window_ids = set(ids)
+                if self._recent is not None:
+                    for previous in self._recent:
+                        window_ids.update(previous)
+                    self._recent.append(ids)
+                self._count_pairs(ids, window_ids)
+        else:
+            mentions = [(ent.start, ent.end, self.intern((ent.text.strip(), ent.label_)))
+                        for ent in doc.ents]
+            for i, (_, end, entity_id) in enumerate(mentions):
+                self.units += 1
+                self.entity_counts[entity_id] += 1
+                following = set()
+                for start, _, other_id in mentions[i + 1:]:
+                    if start - end > self.window:
+                        break
+                    following.add(other_id)
+                self._count_pairs((entity_id,), following)
+
+    def pmi(self, pair_count, count_a, count_b):
+        """Returns log(p(a, b) / (p(a) p(b))) estimated over the counted units."""
+        return math.log(pair_count * self.units / (count_a * count_b))
+
+    def edges(self, min_support=1, rel_type="RELATED_TO"):
+        """Returns ``{(ent1, rel_type, ent2): {"count": n, "pmi": score}}`` for frequent pairs.
+
+        ``ent1`` and ``ent2`` are in ``ordered_endpoints`` order.
+        """
+        edges = {}
+        for pair, count in self.pair_counts.items():
+            if count < min_support:
+                continue
+            a, b = pair >> PAIR_SHIFT, pair & PAIR_MASK
+            ent1, ent2 = ordered_endpoints(self.entities[a], self.entities[b])
+            edges[(ent1, rel_type, ent2)] = {
+                "count": count,
+                "pmi": round(self.pmi(count, self.entity_counts[a], self.entity_counts[b]), 4),
+            }
+        return edges
@@ -0,0 +1,285 @@
+"""Document processing steps shared by the web app and the ingestion workers.
+
+Importing this module has no side effects: the spaCy model is loaded on the
+first call to ``load_nlp_model`` and cached per process, so worker processes
+can import it without touching the database or the web application.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+import numpy as np
+import spacy
+
+from canonicalization import DEFAULT_SIMILARITY, RULES_VERSION, canonicalize
+from cooccurrence import CooccurrenceCounter
+
+# spaCy model used for named entity recognition
+NLP_MODEL_NAME = os.environ.get("SPACY_MODEL", "en_core_web_lg")
+
+# "single" runs the whole document through one nlp(text) call; "pipe" splits it
+# into chunks and streams them through nlp.pipe, optionally on several processes
+NLP_ENGINE = os.environ.get("NLP_ENGINE", "single")
+# Number of chunks buffered per nlp.pipe batch
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", 16))
+# Processes used by nlp.pipe; -1 uses every core
+NLP_PROCESSES = int(os.environ.get("NLP_PROCESSES", 1))
+# Target size of the chunks handed to nlp.pipe
+NLP_CHUNK_CHARS = int(os.environ.get("NLP_CHUNK_CHARS", 20000))
+
+# Processes used to extract page ranges of one PDF; 1 reads pages in the caller
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", 1))
+# Pages handed to an extraction process at a time
+PDF_PAGES_PER_RANGE = int(os.environ.get("PDF_PAGES_PER_RANGE", 8))
+
+# Entities related by a RELATED_TO edge must co-occur within this many units
+COOCCURRENCE_WINDOW = int(os.environ.get("COOCCURRENCE_WINDOW", 1))
+# "sentence" or "token" windows
+COOCCURRENCE_UNIT = os.environ.get("COOCCURRENCE_UNIT", "sentence")
+# Pairs seen in fewer windows than this are not turned into edges
+COOCCURRENCE_MIN_SUPPORT = int(os.environ.get("COOCCURRENCE_MIN_SUPPORT", 2))
+
+# Merge spelling variants of an entity ("ISS" / "the ISS" / "International Space Station")
+CANONICALIZE = os.environ.get("CANONICALIZE", "1") != "0"
+# Cosine similarity an acronym and its expansion need to be merged
+CANONICAL_SIMILARITY = float(os.environ.get("CANONICAL_SIMILARITY", DEFAULT_SIMILARITY))
+
+# Components whose output process_text_to_graph never reads. Entities need
+# "ner" and sentences come from the "parser", which listens to "tok2vec".
+UNUSED_COMPONENTS = ("tagger", "attribute_ruler", "lemmatizer")
+
+_nlp_models = {}
+
+
+def load_nlp_model(name=NLP_MODEL_NAME):
+    """Loads a spaCy model once per process and returns the cached instance."""
+    if name not in _nlp_models:
+        print(f"Loading spaCy model {name} (pid {os.getpid()})...")
+        _nlp_models[name] = spacy.load(name)
+        print("Model loaded.")
+    return _nlp_models[name]
+
+
+def extraction_fingerprint(nlp=None, model_name=NLP_MODEL_NAME):
+    """Short hash of every setting that changes the extracted graph of a document.
+
+    It covers the spaCy model (name and version), the chunking of the "pipe"
+    engine, the co-occurrence window and support and the canonicalization
+    settings and rules. ``result_cache`` stores it with each graph entry.
+    """
+    meta = nlp.meta if nlp is not None else {}
+    settings = {
+        "model": [model_name, meta.get("name"), meta.get("version")],
+        "engine": [NLP_ENGINE, NLP_CHUNK_CHARS if NLP_ENGINE == "pipe" else None],
+        "cooccurrence": [COOCCURRENCE_WINDOW, COOCCURRENCE_UNIT, COOCCURRENCE_MIN_SUPPORT],
+        "canonicalization": [CANONICALIZE, CANONICAL_SIMILARITY, RULES_VERSION],
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def embed_texts(texts, nlp=None):
+    """Returns a float32 matrix with the averaged word vectors of each text.
+
+    Only the tokenizer runs, so this is cheap enough for thousands of names.
+    Texts without any known word get a zero row; with a model that ships no
+    vectors the matrix has zero columns.
+    """
+    nlp = nlp or load_nlp_model()
+    vectors = np.zeros((len(texts), nlp.vocab.vectors_length), dtype=np.float32)
+    if vectors.shape[1]:
+        for row, doc in enumerate(nlp.tokenizer.pipe(texts)):
+            if doc.has_vector:
+                vectors[row] = doc.vector
+    return vectors
+
+
+def count_pdf_pages(pdf_path):
+    """Returns the number of pages in a PDF file."""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def iter_pdf_pages(pdf_path, start=0, stop=None):
+    """Yields the text of each page in ``[start, stop)`` as PyMuPDF reads it."""
+    with fitz.open(pdf_path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for number in range(start, stop):
+            yield doc.load_page(number).get_text("text")
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """Extraction worker: returns the page texts of one page range."""
+    return list(iter_pdf_pages(pdf_path, start, stop))
+
+
+def iter_pdf_page_ranges(pdf_path, workers, pages_per_range=PDF_PAGES_PER_RANGE, window=None):
+    """Yields page texts in order while worker processes extract page ranges.
+
+    At most ``window`` ranges (twice the worker count by default) are in
+    flight, so memory is bounded by the window and not by the document.
+    """
+    total = count_pdf_pages(pdf_path)
+    window = window or workers * 2
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for start in range(0, total, pages_per_range):
+            pending.append(pool.submit(_extract_page_range, pdf_path, start, start + pages_per_range))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_pages(pdf_path, workers=None, pages_per_range=None):
+    """Yields page texts, splitting the PDF across processes when ``workers`` > 1."""
+    workers = workers or PDF_EXTRACT_WORKERS
+    if workers > 1:
+        return iter_pdf_page_ranges(pdf_path, workers, pages_per_range or PDF_PAGES_PER_RANGE)
+    return iter_pdf_pages(pdf_path)
+
+
+def extract_content_from_pdf(pdf_path):
+    """Extracts text content from a PDF file."""
+    print(f"Extracting text from: {pdf_path}")
+    try:
+        return "".join(page + "\n\n" for page in iter_pdf_pages(pdf_path))
+    except Exception as e:
+        print(f"Error extracting text from PDF: {e}")
+        return None
+
+
+def split_text_into_chunks(text, max_chars=NLP_CHUNK_CHARS):
+    """Yields page- or paragraph-sized chunks of ``text``.
+
+    Text is split on blank lines, which separate pages and paragraphs in the
+    extracted PDF text, and consecutive pieces are packed together until a
+    chunk reaches ``max_chars``. A single oversized paragraph is kept whole.
+    Each chunk becomes a separate spaCy doc, so NER and sentence splitting
+    near a boundary lose the context of the neighbouring chunk.
+    """
+    return _pack_paragraphs(text.split("\n\n"), max_chars)
+
+
+def _pack_paragraphs(paragraphs, max_chars):
+    chunk = []
+    size = 0
+    for paragraph in paragraphs:
+        if not paragraph.strip():
+            continue
+        if chunk and size + len(paragraph) > max_chars:
+            yield "\n\n".join(chunk)
+            chunk = []
+            size = 0
+        chunk.append(paragraph)
+        size += len(paragraph) + 2
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+def _collect_graph(docs, min_support=None, nlp=None, report=None):
+    """Returns the entities of ``docs`` and their weighted co-occurrence edges.
+
+    Relationships are returned as a dict mapping each
+    ``(ent1, "RELATED_TO", ent2)`` triple to its ``count`` and ``pmi``. With
+    ``CANONICALIZE`` the entities are a dict mapping each canonical
+    ``(name, label)`` to its properties (``aliases``) and the counts in
+    ``report`` are updated with the reduction.
+    """
+    entities = set()
+    counter = CooccurrenceCounter(COOCCURRENCE_WINDOW, COOCCURRENCE_UNIT)
+    for doc in docs:
+        for ent in doc.ents:
+            entities.add((ent.text.strip(), ent.label_))
+        counter.add_doc(doc)
+    if min_support is None:
+        min_support = COOCCURRENCE_MIN_SUPPORT
+    relationships = counter.edges(min_support)
+    if not CANONICALIZE:
+        return entities, relationships
+
+    counts = {counter.entities[entity_id]: count for entity_id, count in counter.entity_counts.items()}
+    entities, relationships, reduction = canonicalize(
+        entities, relationships, vectors=lambda texts: embed_texts(texts, nlp), threshold=CANONICAL_SIMILARITY,
+        counts=counts)
+    print(f"Canonicalization: {reduction['entities_before']} -> {reduction['entities_after']} entities, "
+          f"{reduction['relationships_before']} -> {reduction['relationships_after']} relationships")
+    if report is not None:
+        report.update(reduction)
+    return entities, relationships
+
+
+def iter_docs(nlp, texts, batch_size=None, n_process=None):
+    """Streams ``texts`` through ``nlp.pipe`` with the unused components disabled."""
+    disable = [name for name in UNUSED_COMPONENTS if name in nlp.pipe_names]
+    return nlp.pipe(
+        texts,
+        batch_size=batch_size or NLP_BATCH_SIZE,
+        n_process=n_process or NLP_PROCESSES,
+        disable=disable,
+    )
+
+
+def process_text_to_graph(text, nlp=None, engine=None, batch_size=None, n_process=None,
+                          min_support=None, report=None):
+    """Processes text to extract entities (nodes) and relationships (edges).
+
+    With the "pipe" engine the text is chunked and streamed through
+    ``nlp.pipe``. Chunks are only cut at blank lines, so the result is
+    approximately, not exactly, that of the "single" engine: NER sees each
+    chunk without the text around it, a sentence broken by a page or
+    paragraph break is split in two, and co-occurrence windows never span a
+    chunk boundary. Entities near a cut may therefore get another label or be
+    missed, and a few relationships may differ. ``report`` receives the
+    canonicalization counts (see ``_collect_graph``).
+    """
+    nlp = nlp or load_nlp_model()
+    engine = engine or NLP_ENGINE
+    print(f"Starting NLP processing ({engine} engine)...")
+
+    if engine == "pipe":
+        docs = iter_docs(nlp, split_text_into_chunks(text), batch_size, n_process)
+    else:
+        docs = [nlp(text)]
+    entities, relationships = _collect_graph(docs, min_support, nlp, report)
+
+    print(f"Processing complete. Entities: {len(entities)}, Relationships: {len(relationships)}")
+    return entities, relationships
+
+
+def process_pages_to_graph(pages, nlp=None, engine=None, batch_size=None, n_process=None, on_page=None,
+                           min_support=None, report=None):
+    """Extracts entities and relationships from an iterable of page texts.
+
+    The result is that of ``process_text_to_graph`` on the pages joined with
+    blank lines. With the "single" engine the pages are joined first, so
+    the document is read before NER starts. With the "pipe" engine they are
+    consumed lazily and packed into the same chunks, so feeding it
+    ``iter_pages`` overlaps PDF extraction with NER and only a window of
+    pages is held in memory. ``on_page`` is called with the number of pages
+    read so far.
+    """
+    nlp = nlp or load_nlp_model()
+    engine = engine or NLP_ENGINE
+
+    def counted(pages):
+        for number, page in enumerate(pages, start=1):
+            if on_page:
+                on_page(number)
+            yield page
+
+    if engine != "pipe":
+        text = "".join(page + "\n\n" for page in counted(pages))
+        return process_text_to_graph(text, nlp, engine, batch_size, n_process, min_support, report)
+
+    print("Starting streaming NLP processing...")
+    paragraphs = (paragraph for page in counted(pages) for paragraph in page.split("\n\n"))
+    docs = iter_docs(nlp, _pack_paragraphs(paragraphs, NLP_CHUNK_CHARS), batch_size, n_process)
+    entities, relationships = _collect_graph(docs, min_support, nlp, report)
+
+    print(f"Processing complete. Entities: {len(entities)}, Relationships: {len(relationships)}")
+    return entities, relationships
@@ -0,0 +1,568 @@
+"""In-process graph store persisted to a local file.
+
+A drop-in replacement for Neo4j on machines without a database server (edge
+devices, CI). The graph lives in flat arrays:
+
+* nodes are integer ids indexing ``_node_label`` (an ``array`` of label
+  numbers) and ``_node_props`` (one dict per node);
+* relationships are integer ids indexing the ``_edge_start``, ``_edge_end``
+  and ``_edge_type`` arrays and ``_edge_props``;
+* adjacency is one ``array`` of outgoing and one of incoming edge ids per node.
+
+Labels have a node-id index and each ``(label, key)`` used for merging has a
+``value -> node id`` property index, so every MERGE is a dict lookup. Ids
+only grow, so they double as the pagination keys of the read endpoints.
+
+The store is saved as gzip JSON through a temporary file and ``os.replace``
+and loaded on first use. Writes only mark it dirty: ``flush`` saves it, and
+is called once per ingested document and summary refresh, by ``close``, at
+exit, and ``SAVE_DELAY`` seconds after the first unsaved write, so a burst
+of writes costs one serialization of the graph instead of one per write. Adjacency and indexes
+are derived data and are rebuilt on load. It is meant for a single process:
+ingestion workers only extract and the web process writes (see
+``ingest_jobs.JobManager``).
+"""
+import atexit
+import gzip
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+from array import array
+
+from graph_backend import GraphBackend
+from graph_schema import ENTITY_KEY, KNOWN_KEYS
+from graph_writer import (DEFAULT_BATCH_SIZE, MENTIONS, chunked, count_batches, display_labels, group_entities,
+                          group_relationships)
+from path_finder import DEFAULT_MAX_DEPTH, DEFAULT_PATHS, k_shortest_paths
+from provenance import SHARED_GROUP, SOURCE_LABELS
+
+FORMAT_VERSION = 1
+# Seconds between the first unsaved write and the automatic flush
+SAVE_DELAY = float(os.environ.get("EMBEDDED_SAVE_DELAY", 2.0))
+
+
+class EmbeddedGraphStore(GraphBackend):
+    """Graph backend keeping the whole graph in memory and in one file."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = False
+        self._save_timer = None
+        self._reset()
+        if path:
+            atexit.register(self.flush)
+
+    # --- STORAGE ---
+
+    def _reset(self):
+        self._labels = []
+        self._label_ids = {}
+        self._types = []
+        self._type_ids = {}
+        self._node_label = array("i")
+        self._node_props = []
+        self._edge_start = array("q")
+        self._edge_end = array("q")
+        self._edge_type = array("i")
+        self._edge_props = []
+        self._out = []
+        self._in = []
+        self._label_index = {}
+        self._property_index = {}
+        self._edge_index = {}
+
+    def _ensure_loaded(self):
+        """Loads the file on first use, so importing the app in a worker reads nothing."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.path and os.path.exists(self.path):
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") != FORMAT_VERSION:
+                    raise ValueError(f"Unsupported graph store version in {self.path}")
+                for label, props in zip(data["node_labels"], data["node_props"]):
+                    self._add_node(label, props)
+                for start, end, rel_type, props in zip(data["edge_start"], data["edge_end"],
+                                                       data["edge_types"], data["edge_props"]):
+                    self._add_edge(start, data["types"][rel_type], end, props)
+            self._loaded = True
+
+    def _mark_dirty(self):
+        """Records an unsaved write and schedules a flush; must be called with ``self._lock`` held."""
+        self._dirty = True
+        if self.path and self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Saves the graph if it changed since the last save."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self.save()
+            self._dirty = False
+
+    def close(self):
+        self.flush()
+
+    def save(self):
+        """Writes the graph to ``path`` atomically (no-op for an in-memory store)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "version": FORMAT_VERSION,
+                "node_labels": [self._labels[label] for label in self._node_label],
+                "node_props": self._node_props,
+                "types": self._types,
+                "edge_start": self._edge_start.tolist(),
+                "edge_end": self._edge_end.tolist(),
+                "edge_types": self._edge_type.tolist(),
+                "edge_props": self._edge_props,
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    f.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def _label_id(self, label):
+        if label not in self._label_ids:
+            self._label_ids[label] = len(self._labels)
+            self._labels.append(label)
+            self._label_index[label] = array("q")
+        return self._label_ids[label]
+
+    def _type_id(self, rel_type):
+        if rel_type not in self._type_ids:
+            self._type_ids[rel_type] = len(self._types)
+            self._types.append(rel_type)
+        return self._type_ids[rel_type]
+
+    def _add_node(self, label, props):
+        node = len(self._node_props)
+        self._node_label.append(self._label_id(label))
+        self._node_props.append(props)
+        self._out.append(array("q"))
+        self._in.append(array("q"))
+        self._label_index[label].append(node)
+        for (indexed_label, key), index in self._property_index.items():
+            if indexed_label == label and key in props:
+                index[props[key]] = node
+        return node
+
+    def _add_edge(self, start, rel_type, end, props):
+        edge = len(self._edge_props)
+        type_id = self._type_id(rel_type)
+        self._edge_start.append(start)
+        self._edge_end.append(end)
+        self._edge_type.append(type_id)
+        self._edge_props.append(props)
+        self._out[start].append(edge)
+        self._in[end].append(edge)
+        self._edge_index[(start, type_id, end)] = edge
+        return edge
+
+    def _index(self, label, key):
+        """Returns the ``value -> node`` index of ``(label, key)``, building it on first use."""
+        index = self._property_index.get((label, key))
+        if index is None:
+            index = {}
+            for node in self._label_index.get(label, ()):
+                value = self._node_props[node].get(key)
+                if value is not None:
+                    index[value] = node
+            self._property_index[(label, key)] = index
+        return index
+
+    def _find_node(self, label, key, value):
+        return self._index(label, key).get(value)
+
+    def _merge_node(self, label, key, value):
+        """Returns ``(node, created)`` for the node of ``label`` whose ``key`` is ``value``."""
+        node = self._find_node(label, key, value)
+        if node is not None:
+            return node, False
+        return self._add_node(label, {key: value}), True
+
+    def _set_props(self, node, props):
+        label = self._labels[self._node_label[node]]
+        self._node_props[node].update(props)
+        for key, value in props.items():
+            index = self._property_index.get((label, key))
+            if index is not None and value is not None:
+                index[value] = node
+
+    def _merge_edge(self, start, rel_type, end, undirected=False):
+        """Returns ``(edge, created)`` for the ``rel_type`` relationship from ``start`` to ``end``.
+
+        With ``undirected`` an existing edge from ``end`` to ``start`` is
+        returned as well, like ``MERGE (a)-[r]-(b)``.
+        """
+        type_id = self._type_id(rel_type)
+        edge = self._edge_index.get((start, type_id, end))
+        if edge is None and undirected:
+            edge = self._edge_index.get((end, type_id, start))
+        if edge is not None:
+            return edge, False
+        return self._add_edge(start, rel_type, end, {}), True
+
+    # --- GRAPHBACKEND ---
+
+    def is_empty(self):
+        self._ensure_loaded()
+        return not self._node_props
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._loaded = True
+            self._mark_dirty()
+
+    def ensure_schema(self, label=None, key=None):
+        self._ensure_loaded()
+        with self._lock:
+            if label is None:
+                for known_label, known_key in KNOWN_KEYS.items():
+                    self._index(known_label, known_key)
+            else:
+                self._index(label, key or KNOWN_KEYS.get(label, ENTITY_KEY))
+        return True
+
+    def backfill_display_labels(self, batch_size=DEFAULT_BATCH_SIZE):
+        self._ensure_loaded()
+        updated = 0
+        with self._lock:
+            for props in self._node_props:
+                if props.get("full_label") is None:
+                    props["display_label"], props["full_label"] = display_labels(props)
+                    updated += 1
+            if updated:
+                self._mark_dirty()
+        return updated
+
+    def write_seed(self, node_specs, relationship_specs, batch_size=DEFAULT_BATCH_SIZE):
+        self._ensure_loaded()
+        timings = {}
+        with self._lock:
+            start = time.perf_counter()
+            for spec in node_specs:
+                for row in spec["rows"]:
+                    node, _ = self._merge_node(spec["label"], spec["key"], row[spec["key"]])
+                    self._set_props(node, row)
+            timings["nodes"] = round(time.perf_counter() - start, 4)
+
+            phase_start = time.perf_counter()
+            for spec in relationship_specs:
+                for group in spec["groups"]:
+                    start_spec, end_spec = group["from"], group["to"]
+                    for a, b in group["pairs"]:
+                        node_a = self._find_node(start_spec["label"], start_spec["key"], a)
+                        node_b = self._find_node(end_spec["label"], end_spec["key"], b)
+                        if node_a is not None and node_b is not None:
+                            self._merge_edge(node_a, spec["type"], node_b)
+            timings["relationships"] = round(time.perf_counter() - phase_start, 4)
+            self._mark_dirty()
+            timings["transaction"] = round(time.perf_counter() - start, 4)
+        return timings
+
+    def write_graph(self, entities, relationships, batch_size=DEFAULT_BATCH_SIZE, on_batch=None, document=None):
+        """Same contract and statistics as ``graph_writer.write_graph``; the file is saved once at the end."""
+        self._ensure_loaded()
+        node_groups = group_entities(entities)
+        relationship_groups = group_relationships(relationships)
+        stats = {
+            "batch_size": batch_size,
+            "entities": len(entities),
+            "relationships": len(relationships),
+            "total_batches": (count_batches(node_groups, batch_size)
+                              + count_batches(relationship_groups, batch_size)),
+            "batches": [],
+        }
+        start = time.perf_counter()
+        with self._lock:
+            source = None
+            if document is not None:
+                source, _ = self._merge_node("Document", "sha256", document)
+
+            def write_node(label, row, counters):
+                node, created = self._merge_node(label, ENTITY_KEY, row["name"])
+                counters[0] += created
+                props = self._node_props[node]
+                props.setdefault("display_label", row["display_label"])
+                props.setdefault("full_label", row["full_label"])
+                if row.get("aliases"):
+                    aliases = props.setdefault("aliases", [])
+                    aliases.extend(alias for alias in row["aliases"] if alias not in aliases)
+                if source is not None:
+                    counters[1] += self._merge_edge(source, MENTIONS, node)[1]
+
+            def write_relationship(key, row, counters):
+                type1, rel_type, type2 = key
+                node_a = self._find_node(type1, ENTITY_KEY, row["a"])
+                node_b = self._find_node(type2, ENTITY_KEY, row["b"])
+                if node_a is None or node_b is None:
+                    return
+                edge, created = self._merge_edge(node_a, rel_type, node_b, undirected=True)
+                counters[1] += created
+                props = self._edge_props[edge]
+                props["count"] = props.get("count", 0) + row["count"]
+                if row["pmi"] is not None and (props.get("pmi") is None or row["pmi"] > props["pmi"]):
+                    props["pmi"] = row["pmi"]
+                if document is not None and document not in props.setdefault("sources", []):
+                    props["sources"].append(document)
+
+            for kind, groups, write_row in (("nodes", node_groups, write_node),
+                                            ("relationships", relationship_groups, write_relationship)):
+                for key, rows in groups.items():
+                    for batch in chunked(rows, batch_size):
+                        batch_start = time.perf_counter()
+                        counters = [0, 0]
+                        for row in batch:
+                            write_row(key, row, counters)
+                        stats["batches"].append({
+                            "kind": kind,
+                            "group": key if isinstance(key, str) else "/".join(key),
+                            "rows": len(batch),
+                            "nodes_created": counters[0],
+                            "relationships_created": counters[1],
+                            "seconds": round(time.perf_counter() - batch_start, 4),
+                        })
+                        if on_batch:
+                            on_batch(len(stats["batches"]), stats["total_batches"])
+            self._mark_dirty()
+        stats["seconds"] = round(time.perf_counter() - start, 4)
+        return stats
+
+    def is_document_loaded(self, sha256):
+        self._ensure_loaded()
+        with self._lock:
+            node = self._find_node("Document", "sha256", sha256)
+            return node is not None and self._node_props[node].get("loaded_at") is not None
+
+    def mark_document_loaded(self, sha256, filename, properties=None):
+        self._ensure_loaded()
+        properties = dict(properties or {}, filename=filename)
+        properties["display_label"], properties["full_label"] = display_labels(
+            {"title": properties.get("title"), "name": filename}
+        )
+        properties["loaded_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        with self._lock:
+            node, _ = self._merge_node("Document", "sha256", sha256)
+            self._set_props(node, properties)
+            self._mark_dirty()
+
+    def _is_source(self, node):
+        return self._labels[self._node_label[node]] in SOURCE_LABELS
+
+    def _neighbors(self, node):
+        for edge in self._out[node]:
+            yield self._edge_end[edge]
+        for edge in self._in[node]:
+            yield self._edge_start[edge]
+
+    def _set_source_group(self, node):
+        props = self._node_props[node]
+        group = (props.get("article_group") or props.get("full_label") or props.get("title")
+                 or props.get("filename") or props.get("sha256"))
+        props["article_group"] = group
+        props["article_groups"] = [group]
+
+    def _set_node_groups(self, node):
+        """Same rule as ``provenance``: sources one hop away, or else two hops through non-sources."""
+        groups = []
+        for neighbor in self._neighbors(node):
+            group = self._node_props[neighbor].get("article_group") if self._is_source(neighbor) else None
+            if group is not None and group not in groups:
+                groups.append(group)
+        if not groups:
+            for middle in self._neighbors(node):
+                if self._is_source(middle):
+                    continue
+                for neighbor in self._neighbors(middle):
+                    group = self._node_props[neighbor].get("article_group") if self._is_source(neighbor) else None
+                    if group is not None and group not in groups:
+                        groups.append(group)
+        props = self._node_props[node]
+        props["article_groups"] = groups
+        props["article_group"] = groups[0] if len(groups) == 1 else SHARED_GROUP
+
+    def compute_article_groups(self, missing_only=False, batch_size=DEFAULT_BATCH_SIZE):
+        self._ensure_loaded()
+        updated = 0
+        with self._lock:
+            nodes = [node for node in range(len(self._node_props))
+                     if not missing_only or self._node_props[node].get("article_group") is None]
+            for node in nodes:
+                if self._is_source(node):
+                    self._set_source_group(node)
+            for node in nodes:
+                if not self._is_source(node):
+                    self._set_node_groups(node)
+                    updated += 1
+            if nodes:
+                self._mark_dirty()
+        return updated
+
+    def update_article_groups(self, sha256, batch_size=DEFAULT_BATCH_SIZE):
+        self._ensure_loaded()
+        with self._lock:
+            source = self._find_node("Document", "sha256", sha256)
+            if source is None:
+                return 0
+            self._set_source_group(source)
+            mentions = self._type_ids.get(MENTIONS)
+            nodes = [self._edge_end[edge] for edge in self._out[source] if self._edge_type[edge] == mentions]
+            for node in nodes:
+                self._set_node_groups(node)
+            self._mark_dirty()
+            return len(nodes)
+
+    def _node_view(self, node):
+        props = self._node_props[node]
+        display_label, full_label = props.get("display_label"), props.get("full_label")
+        if full_label is None:
+            display_label, full_label = display_labels(props)
+        return {
+            "id": str(node),
+            "label": display_label or full_label,
+            "fullLabel": full_label,
+            "group": self._labels[self._node_label[node]],
+            "articleGroup": props.get("article_group"),
+        }
+
+    def _node_id(self, node_id):
+        """Parses an element id into a node index, or None if there is no such node."""
+        try:
+            node = int(node_id)
+        except (TypeError, ValueError):
+            return None
+        return node if 0 <= node < len(self._node_props) else None
+
+    def write_node_properties(self, properties, batch_size=DEFAULT_BATCH_SIZE):
+        self._ensure_loaded()
+        with self._lock:
+            for node_id, values in properties.items():
+                node = self._node_id(node_id)
+                if node is not None:
+                    self._node_props[node].update(values)
+            self._mark_dirty()
+
+    def node_view(self, node_id):
+        self._ensure_loaded()
+        with self._lock:
+            node = self._node_id(node_id)
+            return None if node is None else self._node_view(node)
+
+    def expand_nodes(self, node_ids, types=None, limit=None):
+        """Ranks each node's adjacency arrays with a bounded heap."""
+        self._ensure_loaded()
+        records = []
+        with self._lock:
+            mentions = self._type_ids.get(MENTIONS)
+            wanted = None if types is None else {self._type_ids[t] for t in types if t in self._type_ids}
+            for source in node_ids:
+                node = self._node_id(source)
+                if node is None:
+                    continue
+                candidates = []
+                for edges in (self._out[node], self._in[node]):
+                    for edge in edges:
+                        rel_type = self._edge_type[edge]
+                        if rel_type == mentions or (wanted is not None and rel_type not in wanted):
+                            continue
+                        if edges is self._in[node] and self._edge_start[edge] == node:
+                            continue  # self-loops are already among the outgoing edges
+                        props = self._edge_props[edge]
+                        candidates.append((props.get("count", 1), props.get("pmi") or 0.0, -edge))
+                top = sorted(candidates, reverse=True) if limit is None else heapq.nlargest(limit, candidates)
+                for weight, _, edge in top:
+                    edge = -edge
+                    records.append({
+                        "source": source,
+                        "n": self._node_view(self._edge_start[edge]),
+                        "m": self._node_view(self._edge_end[edge]),
+                        "type": self._types[self._edge_type[edge]],
+                        "weight": weight,
+                        "key": edge,
+                    })
+        yield from records
+
+    def shortest_paths(self, from_id, to_id, k=DEFAULT_PATHS, max_depth=DEFAULT_MAX_DEPTH, types=None, timeout=None):
+        """Runs ``path_finder.k_shortest_paths`` directly on the adjacency arrays."""
+        self._ensure_loaded()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            start, target = self._node_id(from_id), self._node_id(to_id)
+            if start is None or target is None:
+                return [], True
+            mentions = self._type_ids.get(MENTIONS)
+            wanted = None if types is None else {self._type_ids[t] for t in types if t in self._type_ids}
+
+            def neighbors(node):
+                for edges, ends in ((self._out[node], self._edge_end), (self._in[node], self._edge_start)):
+                    for edge in edges:
+                        rel_type = self._edge_type[edge]
+                        if rel_type != mentions and (wanted is None or rel_type in wanted) and ends[edge] != node:
+                            yield edge, ends[edge]
+
+            paths, complete = k_shortest_paths(start, target, neighbors, k, max_depth, deadline)
+            records = [{
+                "nodes": [self._node_view(node) for node in nodes],
+                "edges": [{"key": edge, "type": self._types[self._edge_type[edge]],
+                           "weight": self._edge_props[edge].get("count", 1),
+                           "start": str(self._edge_start[edge]), "end": str(self._edge_end[edge])}
+                          for edge in edges],
+            } for nodes, edges in paths]
+        return records, complete
+
+    def iter_edges(self, after=None, limit=None):
+        """Walks the edge arrays in id order; edges added while iterating are not visited."""
+        self._ensure_loaded()
+        with self._lock:
+            end = len(self._edge_props)
+            mentions = self._type_ids.get(MENTIONS)
+        count = 0
+        for edge in range(0 if after is None else max(after + 1, 0), end):
+            if limit is not None and count >= limit:
+                return
+            if self._edge_type[edge] == mentions:
+                continue
+            yield {
+                "n": self._node_view(self._edge_start[edge]),
+                "m": self._node_view(self._edge_end[edge]),
+                "type": self._types[self._edge_type[edge]],
+                "weight": self._edge_props[edge].get("count", 1),
+                "key": edge,
+            }
+            count += 1
+
+    def iter_nodes(self, after=None, limit=None):
+        self._ensure_loaded()
+        with self._lock:
+            end = len(self._node_props)
+        count = 0
+        for node in range(0 if after is None else max(after + 1, 0), end):
+            if limit is not None and count >= limit:
+                return
+            view = self._node_view(node)
+            yield {"name": view["label"], "fullName": view["fullLabel"], "id": view["id"],
+                   "group": view["group"], "key": node}
+            count += 1
@@ -0,0 +1,326 @@
+"""Graph storage backends behind the web application and the seed loader.
+
+``GraphBackend`` lists every operation the app and ``load_sample_data.py``
+need from the graph: seeding, batched ingestion with provenance, document
+markers, the article-group jobs and the paginated reads. ``Neo4jBackend``
+implements them with Cypher over a Neo4j driver; ``EmbeddedGraphStore`` (in
+``embedded_graph.py``) keeps the graph in process and persists it to a local
+file, so the whole pipeline runs without a database server.
+
+Reads return plain dictionaries shaped like the Cypher projections:
+``iter_edges`` yields ``{"n", "m", "type", "weight", "key"}`` with node views
+``{"id", "label", "fullLabel", "group", "articleGroup"}`` and ``iter_nodes``
+yields ``{"name", "fullName", "id", "group", "key"}``. ``key`` is the stable,
+increasing integer the read endpoints use as pagination cursor.
+``expand_nodes`` yields the heaviest edges around a set of nodes as
+``{"source", "n", "m", "type", "weight", "key"}`` for neighbourhood queries
+and ``shortest_paths`` returns the path records of ``path_finder``.
+"""
+import abc
+import os
+import time
+
+from graph_schema import SchemaManager
+from graph_writer import (DEFAULT_BATCH_SIZE, MENTIONS, backfill_display_labels, chunked, is_document_loaded,
+                          label_expression, mark_document_loaded, quote_identifier, write_graph)
+from path_finder import DEFAULT_MAX_DEPTH, DEFAULT_PATHS
+from provenance import compute_article_groups, update_article_groups
+
+# "neo4j" (default) or "embedded"
+GRAPH_BACKEND = os.environ.get("GRAPH_BACKEND", "neo4j")
+# File the embedded backend loads from and saves to
+EMBEDDED_GRAPH_PATH = os.environ.get("EMBEDDED_GRAPH_PATH", "graph_store.json.gz")
+
+
+class GraphBackend(abc.ABC):
+    """Operations the application needs from a graph store.
+
+    Every operation except ``close`` and ``flush`` is abstract, so a backend
+    that misses one cannot be instantiated.
+    """
+
+    def close(self):
+        """Releases the connection or file handles held by the backend."""
+
+    def flush(self):
+        """Makes the writes done so far durable (a no-op for backends that already are)."""
+
+    @abc.abstractmethod
+    def is_empty(self):
+        """Returns True if the graph has no nodes; raises if the store is unavailable."""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Deletes every node and relationship."""
+
+    @abc.abstractmethod
+    def ensure_schema(self, label=None, key=None):
+        """Makes lookups of ``label`` by ``key`` fast (all known labels when omitted); returns True on success."""
+
+    @abc.abstractmethod
+    def backfill_display_labels(self, batch_size=DEFAULT_BATCH_SIZE):
+        """Stores display labels on nodes that lack them and returns how many were updated."""
+
+    @abc.abstractmethod
+    def write_seed(self, node_specs, relationship_specs, batch_size=DEFAULT_BATCH_SIZE):
+        """Merges the seed files' nodes and relationships and returns the timing of each phase."""
+
+    @abc.abstractmethod
+    def write_graph(self, entities, relationships, batch_size=DEFAULT_BATCH_SIZE, on_batch=None, document=None):
+        """Writes extracted entities and relationships; see ``graph_writer.write_graph``."""
+
+    @abc.abstractmethod
+    def is_document_loaded(self, sha256):
+        """Returns True if the ``Document`` with this content hash was already ingested."""
+
+    @abc.abstractmethod
+    def mark_document_loaded(self, sha256, filename, properties=None):
+        """Records the ``Document`` node of an ingested file."""
+
+    @abc.abstractmethod
+    def compute_article_groups(self, missing_only=False, batch_size=DEFAULT_BATCH_SIZE):
+        """See ``provenance.compute_article_groups``."""
+
+    @abc.abstractmethod
+    def update_article_groups(self, sha256, batch_size=DEFAULT_BATCH_SIZE):
+        """See ``provenance.update_article_groups``."""
+
+    @abc.abstractmethod
+    def iter_edges(self, after=None, limit=None):
+        """Yields edges (without ``MENTIONS`` links) in key order, starting after ``after``."""
+
+    @abc.abstractmethod
+    def iter_nodes(self, after=None, limit=None):
+        """Yields nodes in key order, starting after ``after``."""
+
+    @abc.abstractmethod
+    def write_node_properties(self, properties, batch_size=DEFAULT_BATCH_SIZE):
+        """Merges ``{node id: {name: value}}`` into the properties of each node (analytics results)."""
+
+    @abc.abstractmethod
+    def node_view(self, node_id):
+        """Returns the projected view of the node with id ``node_id``, or None."""
+
+    @abc.abstractmethod
+    def expand_nodes(self, node_ids, types=None, limit=None):
+        """Yields, for each node of ``node_ids``, its ``limit`` heaviest edges (all when None).
+
+        Edges in either direction are considered, ``MENTIONS`` links never.
+        ``types`` restricts the relationship types. Edges are ranked by
+        ``count`` (1 when missing), then ``pmi``. Each record names the
+        expanded node in ``source`` and the edge endpoints in ``n``/``m``
+        (start/end, as in ``iter_edges``).
+        """
+
+    @abc.abstractmethod
+    def shortest_paths(self, from_id, to_id, k=DEFAULT_PATHS, max_depth=DEFAULT_MAX_DEPTH, types=None, timeout=None):
+        """Returns ``(path records, complete)``: up to ``k`` shortest paths between two nodes.
+
+        Paths follow edges in either direction, never ``MENTIONS`` links, and
+        have at most ``max_depth`` edges; ``types`` restricts the relationship
+        types. ``complete`` is False when ``timeout`` (seconds) cut the search
+        short. Path records are described in ``path_finder.describe_paths``.
+        """
+
+
+def open_backend(uri, auth, kind=GRAPH_BACKEND, path=EMBEDDED_GRAPH_PATH):
+    """Creates the backend selected by ``kind`` ("neo4j" or "embedded")."""
+    if kind == "embedded":
+        from embedded_graph import EmbeddedGraphStore
+        return EmbeddedGraphStore(path)
+    if kind != "neo4j":
+        raise ValueError(f"Unknown graph backend {kind!r}; use 'neo4j' or 'embedded'")
+    from neo4j import GraphDatabase
+    return Neo4jBackend(GraphDatabase.driver(uri, auth=auth))
+
+
+# --- NEO4J ---
+
+def node_merge_query(spec):
+    """Builds the UNWIND ... MERGE of a seed node file (key in "key", other properties via SET)."""
+    key = quote_identifier(spec["key"])
+    return (
+        f"UNWIND $rows AS row "
+        f"MERGE (n:{quote_identifier(spec['label'])} {{{key}: row.{key}}}) "
+        f"SET n += row"
+    )
+
+
+def relationship_merge_query(rel_type, group):
+    """Builds the UNWIND ... MERGE of one group of [start, end] pairs of a seed relationship file."""
+    start, end = group["from"], group["to"]
+    return (
+        f"UNWIND $rows AS row "
+        f"MATCH (a:{quote_identifier(start['label'])} {{{quote_identifier(start['key'])}: row[0]}}) "
+        f"MATCH (b:{quote_identifier(end['label'])} {{{quote_identifier(end['key'])}: row[1]}}) "
+        f"MERGE (a)-[:{quote_identifier(rel_type)}]->(b)"
+    )
+
+
+def node_projection(var):
+    """Cypher map with only the fields the visualization needs from node ``var``.
+
+    Labels are read from the precomputed ``display_label``/``full_label``
+    properties, computed on the fly for nodes written before they existed.
+    The article group is the one stored by the provenance jobs.
+    """
+    full_label = f"coalesce({var}.full_label, toString({label_expression(var)}))"
+    return (
+        f"{{id: elementId({var}), label: coalesce({var}.display_label, {full_label}), "
+        f"fullLabel: {full_label}, group: labels({var})[0], articleGroup: {var}.article_group}}"
+    )
+
+
+class Neo4jBackend(GraphBackend):
+    """Graph backend on a Neo4j database, with batched Cypher writes and streamed reads."""
+
+    def __init__(self, driver, database="neo4j"):
+        self.driver = driver
+        self.database = database
+        # Creates the uniqueness constraints for every label before it is written
+        self.schema = SchemaManager(driver, database)
+
+    def close(self):
+        self.driver.close()
+
+    def is_empty(self):
+        with self.driver.session(database=self.database) as session:
+            return session.run("MATCH (n) RETURN n LIMIT 1").single() is None
+
+    def clear(self):
+        with self.driver.session(database=self.database) as session:
+            session.run("MATCH (n) DETACH DELETE n").consume()
+
+    def ensure_schema(self, label=None, key=None):
+        if label is None:
+            return self.schema.ensure_known()
+        return self.schema.ensure(label, key)
+
+    def backfill_display_labels(self, batch_size=DEFAULT_BATCH_SIZE):
+        return backfill_display_labels(self.driver, batch_size=batch_size, database=self.database)
+
+    def write_seed(self, node_specs, relationship_specs, batch_size=DEFAULT_BATCH_SIZE):
+        """Writes the whole seed in a single transaction, so a failed load leaves nothing behind."""
+        timings = {}
+
+        def write(tx):
+            phase_start = time.perf_counter()
+            for spec in node_specs:
+                query = node_merge_query(spec)
+                for batch in chunked(spec["rows"], batch_size):
+                    tx.run(query, rows=batch).consume()
+            timings["nodes"] = round(time.perf_counter() - phase_start, 4)
+
+            phase_start = time.perf_counter()
+            for spec in relationship_specs:
+                for group in spec["groups"]:
+                    query = relationship_merge_query(spec["type"], group)
+                    for batch in chunked(group["pairs"], batch_size):
+                        tx.run(query, rows=batch).consume()
+            timings["relationships"] = round(time.perf_counter() - phase_start, 4)
+
+        with self.driver.session(database=self.database) as session:
+            phase_start = time.perf_counter()
+            session.execute_write(write)
+            timings["transaction"] = round(time.perf_counter() - phase_start, 4)
+        return timings
+
+    def write_graph(self, entities, relationships, batch_size=DEFAULT_BATCH_SIZE, on_batch=None, document=None):
+        return write_graph(self.driver, entities, relationships, batch_size=batch_size,
+                           database=self.database, on_batch=on_batch, schema=self.schema, document=document)
+
+    def is_document_loaded(self, sha256):
+        return is_document_loaded(self.driver, sha256, database=self.database)
+
+    def mark_document_loaded(self, sha256, filename, properties=None):
+        mark_document_loaded(self.driver, sha256, filename, properties=properties, database=self.database)
+
+    def compute_article_groups(self, missing_only=False, batch_size=DEFAULT_BATCH_SIZE):
+        return compute_article_groups(self.driver, missing_only=missing_only, batch_size=batch_size,
+                                      database=self.database)
+
+    def update_article_groups(self, sha256, batch_size=DEFAULT_BATCH_SIZE):
+        return update_article_groups(self.driver, sha256, batch_size=batch_size, database=self.database)
+
+    def iter_edges(self, after=None, limit=None):
+        """Streams the edge query record by record, so nothing is buffered."""
+        query = (
+            f"MATCH (n)-[r]->(m) WHERE type(r) <> '{MENTIONS}' AND ($after IS NULL OR id(r) > $after) "
+            f"RETURN {node_projection('n')} AS n, {node_projection('m')} AS m, "
+            "type(r) AS type, coalesce(r.count, 1) AS weight, id(r) AS key ORDER BY key"
+        )
+        if limit is not None:
+            query += " LIMIT $limit"
+        with self.driver.session(database=self.database) as session:
+            for record in session.run(query, after=after, limit=limit):
+                yield record.data()
+
+    def write_node_properties(self, properties, batch_size=DEFAULT_BATCH_SIZE):
+        query = "UNWIND $rows AS row MATCH (n) WHERE elementId(n) = row.id SET n += row.properties"
+        rows = [{"id": node_id, "properties": values} for node_id, values in properties.items()]
+        with self.driver.session(database=self.database) as session:
+            for batch in chunked(rows, batch_size):
+                session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+
+    def node_view(self, node_id):
+        query = f"MATCH (n) WHERE elementId(n) = $id RETURN {node_projection('n')} AS n"
+        with self.driver.session(database=self.database) as session:
+            record = session.run(query, id=node_id).single()
+        return None if record is None else record["n"]
+
+    def expand_nodes(self, node_ids, types=None, limit=None):
+        """One query for the whole frontier; the per-node top-k runs in a CALL subquery."""
+        query = (
+            "UNWIND $ids AS source MATCH (s) WHERE elementId(s) = source "
+            "CALL { WITH s MATCH (s)-[r]-() "
+            f"WHERE type(r) <> '{MENTIONS}' AND ($types IS NULL OR type(r) IN $types) "
+            "WITH r, coalesce(r.count, 1) AS weight "
+            "ORDER BY weight DESC, coalesce(r.pmi, 0.0) DESC, id(r) "
+            + ("LIMIT $limit " if limit is not None else "")
+            + "RETURN r, weight } "
+            "WITH source, r, weight, startNode(r) AS n, endNode(r) AS m "
+            f"RETURN source, {node_projection('n')} AS n, {node_projection('m')} AS m, "
+            "type(r) AS type, weight, id(r) AS key"
+        )
+        with self.driver.session(database=self.database) as session:
+            for record in session.run(query, ids=list(node_ids), types=types, limit=limit):
+                yield record.data()
+
+    def shortest_paths(self, from_id, to_id, k=DEFAULT_PATHS, max_depth=DEFAULT_MAX_DEPTH, types=None, timeout=None):
+        """``allShortestPaths`` with the filters applied during the search and ``timeout`` as transaction timeout.
+
+        Only paths of the shortest length are returned, not longer alternatives.
+        """
+        from neo4j import Query
+        from neo4j.exceptions import ClientError
+
+        query = (
+            "MATCH (a) WHERE elementId(a) = $from_id MATCH (b) WHERE elementId(b) = $to_id "
+            f"MATCH p = allShortestPaths((a)-[*..{int(max_depth)}]-(b)) "
+            f"WHERE all(r IN relationships(p) WHERE type(r) <> '{MENTIONS}' "
+            "AND ($types IS NULL OR type(r) IN $types)) "
+            f"RETURN [x IN nodes(p) | {node_projection('x')}] AS nodes, "
+            "[r IN relationships(p) | {key: id(r), type: type(r), weight: coalesce(r.count, 1), "
+            "start: elementId(startNode(r)), end: elementId(endNode(r))}] AS edges LIMIT $k"
+        )
+        try:
+            with self.driver.session(database=self.database) as session:
+                result = session.run(Query(query, timeout=timeout), from_id=from_id, to_id=to_id, types=types, k=k)
+                return [record.data() for record in result], True
+        except ClientError as e:
+            if "TimedOut" not in (e.code or ""):
+                raise
+            return [], False
+
+    def iter_nodes(self, after=None, limit=None):
+        query = (
+            "MATCH (n) WHERE $after IS NULL OR id(n) > $after "
+            f"WITH n, coalesce(n.full_label, toString({label_expression('n')})) AS full_label "
+            "RETURN coalesce(n.display_label, full_label) AS name, full_label AS fullName, "
+            "elementId(n) AS id, labels(n)[0] AS group, id(n) AS key ORDER BY key"
+        )
+        if limit is not None:
+            query += " LIMIT $limit"
+        with self.driver.session(database=self.database) as session:
+            for record in session.run(query, after=after, limit=limit):
+                yield record.data()
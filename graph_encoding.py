@@ -0,0 +1,122 @@
+"""Compact encodings of the graph read responses.
+
+Plain JSON repeats every key on every node and strings such as the group
+and article group thousands of times. ``to_columnar`` turns each list of
+records (``nodes``, ``edges``) into one array per field instead:
+
+* string fields hold indices into a single ``strings`` table shared by the
+  whole payload (``-1`` for a missing value), so each distinct string is sent
+  once; ``encoded`` lists those fields per table;
+* ``from``/``to`` of edges are integer indices into ``nodes.id``; endpoints
+  that are not in the payload (e.g. the community super-nodes of a zoomed
+  community) continue the numbering in ``external_ids``;
+* numbers stay plain arrays, with ``null`` for a missing value;
+* ``id`` columns are sent as they are.
+
+The columnar payload is sent as JSON or as msgpack, and any body can be
+compressed with gzip or, when the ``brotli`` package is installed, brotli.
+"""
+import gzip
+import json
+
+import msgpack
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is used instead
+    brotli = None
+
+COLUMNAR_VERSION = 1
+# Fields kept verbatim instead of being dictionary encoded
+PLAIN_FIELDS = ("id",)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+MIMETYPES = {
+    "json": "application/json",
+    "columnar": "application/json",
+    "msgpack": "application/x-msgpack",
+}
+
+
+def available_encodings():
+    """Content encodings this server can produce, preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def add(self, value):
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def _columns(records, strings, encoded, node_index=None, external_ids=None):
+    fields = list(dict.fromkeys(field for record in records for field in record))
+    columns = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        if node_index is not None and field in ("from", "to"):
+            column = []
+            for value in values:
+                index = node_index.get(value)
+                if index is None:
+                    index = node_index[value] = len(node_index)
+                    external_ids.append(value)
+                column.append(index)
+            columns[field] = column
+        elif field not in PLAIN_FIELDS and any(isinstance(value, str) for value in values):
+            columns[field] = [-1 if value is None else strings.add(str(value)) for value in values]
+            encoded.append(field)
+        else:
+            columns[field] = values
+    return columns
+
+
+def to_columnar(data):
+    """Converts a ``{"nodes": [...], "edges": [...], ...}`` payload to the columnar layout.
+
+    Other top-level keys (cursors, counts) are copied unchanged.
+    """
+    strings = _StringTable()
+    nodes = data.get("nodes") or []
+    payload = {key: value for key, value in data.items() if key not in ("nodes", "edges")}
+    payload["format"] = "columnar"
+    payload["version"] = COLUMNAR_VERSION
+    payload["node_count"] = len(nodes)
+    payload["encoded"] = {"nodes": []}
+    payload["nodes"] = _columns(nodes, strings, payload["encoded"]["nodes"])
+    if "edges" in data:
+        node_index = {node.get("id"): index for index, node in enumerate(nodes)}
+        external_ids = []
+        payload["encoded"]["edges"] = []
+        payload["edge_count"] = len(data["edges"])
+        payload["edges"] = _columns(data["edges"], strings, payload["encoded"]["edges"], node_index, external_ids)
+        payload["external_ids"] = external_ids
+    payload["strings"] = strings.strings
+    return payload
+
+
+def encode_payload(data, fmt, dumps=json.dumps):
+    """Serializes ``data`` as "json" (with ``dumps``), "columnar" JSON or "msgpack"; returns bytes."""
+    if fmt == "json":
+        return dumps(data).encode("utf-8")
+    columnar = to_columnar(data)
+    if fmt == "msgpack":
+        return msgpack.packb(columnar, use_bin_type=True)
+    return json.dumps(columnar, separators=(",", ":")).encode("utf-8")
+
+
+def compress(body, encoding):
+    """Compresses ``body`` with "gzip" or "br"; returns ``(body, encoding)`` ("identity" when not compressed)."""
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return body, "identity"
@@ -0,0 +1,86 @@
+"""Uniqueness constraints and indexes for the properties nodes are matched by.
+
+Every write path matches or merges nodes by one id property per label:
+``paper_id``, ``author_id`` and friends for the curated labels, ``name`` for
+the labels produced by spaCy and ``sha256`` for documents. Without a
+constraint each of those lookups is a label scan. ``SchemaManager`` creates
+the constraints for the known labels at startup and for new entity labels
+right before the first write to them, remembering what it has already done
+so the check costs nothing afterwards.
+"""
+import re
+import threading
+
+from graph_writer import quote_identifier
+
+# Id property of every label written by the seed data and the pipeline
+KNOWN_KEYS = {
+    "Paper": "paper_id",
+    "Author": "author_id",
+    "Institution": "institution_id",
+    "Keyword": "keyword_id",
+    "CellType": "cell_type_id",
+    "Gene": "gene_id",
+    "Method": "method_id",
+    "Material": "material_id",
+    "Funder": "funder_id",
+    "Mission": "mission_id",
+    "Document": "sha256",
+}
+
+# Property that identifies nodes of spaCy entity labels (PERSON, ORG, ...)
+ENTITY_KEY = "name"
+
+
+def constraint_name(label, key):
+    """Returns a stable, valid schema object name for a label/property pair."""
+    return "unique_" + re.sub(r"[^0-9a-zA-Z]+", "_", f"{label}_{key}").strip("_").lower()
+
+
+class SchemaManager:
+    """Ensures a uniqueness constraint exists for every (label, key) that is written.
+
+    When a constraint cannot be created, typically because older data already
+    holds duplicates, a plain index is created instead so lookups stay fast.
+    Failures (for example Neo4j being down) are not remembered, so the next
+    write retries.
+    """
+
+    def __init__(self, driver, database="neo4j"):
+        self.driver = driver
+        self.database = database
+        self._ensured = set()
+        self._lock = threading.Lock()
+
+    def ensure(self, label, key=None):
+        """Makes sure ``label`` has a constraint (or index) on ``key``; returns True on success."""
+        key = key or KNOWN_KEYS.get(label, ENTITY_KEY)
+        if (label, key) in self._ensured:
+            return True
+        with self._lock:
+            if (label, key) in self._ensured:
+                return True
+            target = f"(n:{quote_identifier(label)})"
+            prop = f"n.{quote_identifier(key)}"
+            name = constraint_name(label, key)
+            try:
+                with self.driver.session(database=self.database) as session:
+                    try:
+                        session.run(
+                            f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR {target} REQUIRE {prop} IS UNIQUE"
+                        ).consume()
+                    except Exception as e:
+                        print(f"Could not create constraint {name}, creating an index instead: {e}")
+                        session.run(
+                            f"CREATE INDEX {name.replace('unique_', 'index_', 1)} IF NOT EXISTS "
+                            f"FOR {target} ON ({prop})"
+                        ).consume()
+            except Exception as e:
+                print(f"Error creating schema for {label}.{key}: {e}")
+                return False
+            self._ensured.add((label, key))
+            return True
+
+    def ensure_known(self):
+        """Creates the constraints for every label in ``KNOWN_KEYS``."""
+        return all([self.ensure(label, key) for label, key in KNOWN_KEYS.items()])
@@ -0,0 +1,254 @@
+"""Batched graph writer for Neo4j.
+
+Entities are grouped by label and relationships by the labels of their two
+endpoints, and every group is written with chunked ``UNWIND $rows``
+statements inside managed write transactions. A document therefore costs one
+round trip per batch instead of one per entity and relationship.
+"""
+import time
+from collections import defaultdict
+
+from cooccurrence import ordered_endpoints
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Properties tried, in order, to name a node in the UI
+LABEL_KEYS = ("title", "name", "term", "paper_id", "author_id", "institution_id", "keyword_id",
+              "cell_type_id", "gene_id", "method_id", "material_id", "funder_id", "mission_id")
+# Longer labels are truncated in the graph so nodes do not stretch
+DISPLAY_LABEL_LENGTH = 50
+# Relationship from a Document to each entity extracted from it
+MENTIONS = "MENTIONS"
+
+
+def quote_identifier(name):
+    """Quotes a label or relationship type so it can be interpolated into Cypher."""
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def truncate_label(label):
+    """Shortens a label to DISPLAY_LABEL_LENGTH characters, ending it with '...'."""
+    if len(label) > DISPLAY_LABEL_LENGTH:
+        return label[:DISPLAY_LABEL_LENGTH - 3] + "..."
+    return label
+
+
+def display_labels(properties):
+    """Returns ``(display_label, full_label)`` for a node's properties.
+
+    The full label is the first of ``LABEL_KEYS`` the node has, falling back
+    to its first property; the display label is the truncated full label.
+    """
+    full_label = next((str(properties[key]) for key in LABEL_KEYS if properties.get(key) is not None), None)
+    if full_label is None:
+        values = [value for key, value in properties.items() if key not in ("display_label", "full_label")]
+        full_label = str(values[0]) if values else "Unnamed"
+    return truncate_label(full_label), full_label
+
+
+def label_expression(var):
+    """Cypher expression computing the full label of node ``var`` from its properties."""
+    return "coalesce(" + ", ".join(f"{var}.{key}" for key in LABEL_KEYS) + ", 'Unnamed')"
+
+
+def chunked(rows, size):
+    """Yields successive lists of at most ``size`` rows."""
+    size = max(1, int(size))
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def group_entities(entities):
+    """Groups ``(name, label)`` entities into ``{label: [row, ...]}``.
+
+    ``entities`` may be a set of pairs or a dict mapping each pair to its
+    properties, such as the ``aliases`` left by canonicalization.
+    """
+    properties = entities if isinstance(entities, dict) else {}
+    groups = defaultdict(list)
+    for name, label in entities:
+        display_label, full_label = display_labels({"name": name})
+        row = {"name": name, "display_label": display_label, "full_label": full_label}
+        aliases = (properties.get((name, label)) or {}).get("aliases")
+        if aliases:
+            row["aliases"] = list(aliases)
+        groups[label].append(row)
+    return groups
+
+
+def group_relationships(relationships):
+    """Groups ``((name, label), type, (name, label))`` triples by endpoint labels and type.
+
+    ``relationships`` may be a set of triples or a dict mapping each triple to
+    its co-occurrence ``count`` and ``pmi``. Co-occurrence is undirected, so
+    each row is put in ``ordered_endpoints`` order.
+    """
+    weights = relationships if isinstance(relationships, dict) else {}
+    groups = defaultdict(list)
+    for (ent1, rel_type, ent2) in relationships:
+        weight = weights.get((ent1, rel_type, ent2)) or {}
+        (name1, type1), (name2, type2) = ordered_endpoints(ent1, ent2)
+        groups[(type1, rel_type, type2)].append({
+            "a": name1,
+            "b": name2,
+            "count": weight.get("count", 1),
+            "pmi": weight.get("pmi"),
+        })
+    return groups
+
+
+def _run_batch(tx, query, rows, document=None):
+    """Runs one UNWIND statement inside a write transaction and returns its counters."""
+    return tx.run(query, rows=rows, document=document).consume().counters
+
+
+def count_batches(groups, batch_size):
+    """Returns how many batches ``_write_groups`` will send for ``groups``."""
+    size = max(1, int(batch_size))
+    return sum(-(-len(rows) // size) for rows in groups.values())
+
+
+def _write_groups(session, kind, groups, build_query, batch_size, stats, on_batch=None, document=None):
+    """Writes every group in chunks, appending one timing entry per batch to ``stats``."""
+    for key, rows in groups.items():
+        query = build_query(key, document is not None)
+        for batch in chunked(rows, batch_size):
+            start = time.perf_counter()
+            counters = session.execute_write(_run_batch, query, batch, document)
+            stats["batches"].append({
+                "kind": kind,
+                "group": key if isinstance(key, str) else "/".join(key),
+                "rows": len(batch),
+                "nodes_created": counters.nodes_created,
+                "relationships_created": counters.relationships_created,
+                "seconds": round(time.perf_counter() - start, 4),
+            })
+            if on_batch:
+                on_batch(len(stats["batches"]), stats["total_batches"])
+
+
+def _node_query(label, with_document=False):
+    query = (
+        f"UNWIND $rows AS row MERGE (n:{quote_identifier(label)} {{name: row.name}}) "
+        f"SET n.display_label = coalesce(n.display_label, row.display_label), "
+        f"n.full_label = coalesce(n.full_label, row.full_label), "
+        f"n.aliases = CASE WHEN row.aliases IS NULL THEN n.aliases "
+        f"ELSE coalesce(n.aliases, []) + [a IN row.aliases WHERE NOT a IN coalesce(n.aliases, [])] END"
+    )
+    if with_document:
+        # Provenance: the document links to every entity extracted from it
+        query = f"MERGE (d:Document {{sha256: $document}}) WITH d {query} MERGE (d)-[:{MENTIONS}]->(n)"
+    return query
+
+
+def _relationship_query(key, with_document=False):
+    type1, rel_type, type2 = key
+    query = (
+        f"UNWIND $rows AS row "
+        f"MATCH (a:{quote_identifier(type1)} {{name: row.a}}) "
+        f"MATCH (b:{quote_identifier(type2)} {{name: row.b}}) "
+        # Undirected, so an edge stored the other way round is reused
+        f"MERGE (a)-[r:{quote_identifier(rel_type)}]-(b) "
+        f"SET r.count = coalesce(r.count, 0) + row.count, "
+        f"r.pmi = CASE WHEN r.pmi IS NULL OR row.pmi > r.pmi THEN row.pmi ELSE r.pmi END"
+    )
+    if with_document:
+        # Provenance: every document the relationship was found in
+        query += (
+            ", r.sources = CASE WHEN $document IN coalesce(r.sources, []) THEN r.sources "
+            "ELSE coalesce(r.sources, []) + $document END"
+        )
+    return query
+
+
+def write_graph(driver, entities, relationships, batch_size=DEFAULT_BATCH_SIZE,
+                database="neo4j", on_batch=None, schema=None, document=None):
+    """Writes entities and relationships in batches and returns per-batch statistics.
+
+    Nodes are always written before relationships so that every ``MATCH`` in
+    the relationship batches can find its endpoints. ``on_batch`` is called
+    with ``(batches_done, total_batches)`` after every committed batch. When a
+    ``SchemaManager`` is given, each label gets its ``name`` constraint
+    before the first write to it. With ``document`` (the SHA-256 of the source
+    document) every entity is linked from that ``Document`` by a ``MENTIONS``
+    relationship and every relationship lists it in ``sources``.
+    """
+    node_groups = group_entities(entities)
+    relationship_groups = group_relationships(relationships)
+    if schema is not None:
+        labels = set(node_groups)
+        if document is not None:
+            labels.add("Document")
+        for type1, _, type2 in relationship_groups:
+            labels.update((type1, type2))
+        for label in labels:
+            schema.ensure(label)
+    stats = {
+        "batch_size": batch_size,
+        "entities": len(entities),
+        "relationships": len(relationships),
+        "total_batches": (count_batches(node_groups, batch_size)
+                          + count_batches(relationship_groups, batch_size)),
+        "batches": [],
+    }
+    start = time.perf_counter()
+    with driver.session(database=database) as session:
+        _write_groups(session, "nodes", node_groups, _node_query, batch_size, stats, on_batch, document)
+        _write_groups(session, "relationships", relationship_groups, _relationship_query,
+                      batch_size, stats, on_batch, document)
+    stats["seconds"] = round(time.perf_counter() - start, 4)
+    return stats
+
+
+def is_document_loaded(driver, sha256, database="neo4j"):
+    """Returns True if the document with this content hash was already written.
+
+    The ``Document`` node is created by the first batch of ``write_graph``;
+    only ``mark_document_loaded`` sets ``loaded_at``, so an interrupted write
+    is retried.
+    """
+    with driver.session(database=database) as session:
+        record = session.run(
+            "MATCH (d:Document {sha256: $sha256}) WHERE d.loaded_at IS NOT NULL "
+            "RETURN count(d) AS found", sha256=sha256
+        ).single()
+        return bool(record and record["found"])
+
+
+def mark_document_loaded(driver, sha256, filename, properties=None, database="neo4j"):
+    """Records that the document with this content hash is now in the graph."""
+    properties = dict(properties or {}, filename=filename)
+    properties["display_label"], properties["full_label"] = display_labels(
+        {"title": properties.get("title"), "name": filename}
+    )
+    with driver.session(database=database) as session:
+        session.execute_write(
+            lambda tx: tx.run(
+                "MERGE (d:Document {sha256: $sha256}) "
+                "SET d += $properties, d.loaded_at = datetime()",
+                sha256=sha256, properties=properties,
+            ).consume()
+        )
+
+
+def backfill_display_labels(driver, batch_size=DEFAULT_BATCH_SIZE, database="neo4j"):
+    """Stores display and full labels on nodes written before they were precomputed.
+
+    Returns the number of nodes updated.
+    """
+    query = (
+        f"MATCH (n) WHERE n.full_label IS NULL WITH n LIMIT $batch_size "
+        f"WITH n, toString({label_expression('n')}) AS full "
+        f"SET n.full_label = full, n.display_label = CASE WHEN size(full) > {DISPLAY_LABEL_LENGTH} "
+        f"THEN left(full, {DISPLAY_LABEL_LENGTH - 3}) + '...' ELSE full END "
+        f"RETURN count(n) AS updated"
+    )
+    total = 0
+    with driver.session(database=database) as session:
+        while True:
+            updated = session.execute_write(
+                lambda tx: tx.run(query, batch_size=batch_size).single()["updated"]
+            )
+            total += updated
+            if updated < batch_size:
+                return total
@@ -0,0 +1,586 @@
+"""Background ingestion jobs for uploaded documents.
+
+Uploads are turned into jobs that run in a pool of worker processes. Each
+worker loads the spaCy model and opens its own Neo4j driver once, in the pool
+initializer, and reports stage changes back to the web process through a
+multiprocessing queue. The number of queued plus running jobs is bounded so
+that a burst of uploads is rejected instead of piling up. A pool broken by a
+dying worker (for example one killed for running out of memory) fails the
+jobs it held and is replaced by a fresh one.
+
+With an in-process graph backend (the embedded store) workers only extract:
+they return the graph and the web process writes it through its backend. The
+web process also checks whether a document is already loaded before handing
+it to the pool, since those workers cannot see the graph.
+
+A batch of documents is admitted as a whole against a separate backlog
+limit and fed to the pool a few at a time: each finished job submits the
+next waiting documents, so a batch never holds more than its
+``parallelism`` pool slots, and documents still waiting in a batch take no
+slot of the ``max_pending`` queue.
+"""
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from document_pipeline import (NLP_MODEL_NAME, count_pdf_pages, embed_texts, extraction_fingerprint, iter_pages,
+                               load_nlp_model, process_pages_to_graph)
+from graph_backend import Neo4jBackend
+from result_cache import ResultCache
+
+FINISHED_STAGES = ("done", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept another job."""
+
+
+# --- WORKER PROCESS SIDE ---
+
+# Per-process state filled in by the pool initializer
+_worker = {}
+
+
+def _init_worker(uri, auth, model_name, batch_size, cache_dir, cache_max_bytes, events):
+    """Pool initializer: loads the NLP model and opens a Neo4j driver once per worker.
+
+    Without a ``uri`` the worker has no database and returns extracted graphs instead.
+    """
+    _worker["events"] = events
+    _worker["batch_size"] = batch_size
+    _worker["backend"] = None
+    if uri is not None:
+        from neo4j import GraphDatabase
+
+        _worker["backend"] = Neo4jBackend(GraphDatabase.driver(uri, auth=auth))
+        _worker["backend"].ensure_schema()
+    _worker["nlp"] = load_nlp_model(model_name)
+    _worker["cache"] = None
+    if cache_dir:
+        fingerprint = extraction_fingerprint(_worker["nlp"], model_name)
+        _worker["cache"] = ResultCache(cache_dir, cache_max_bytes, fingerprint)
+    events.put((None, "worker_ready", 1.0, time.time(), {"pid": os.getpid()}))
+
+
+def _ping():
+    """No-op task used to make the pool start its workers ahead of the first job."""
+    return os.getpid()
+
+
+def _embed(texts):
+    """Computes embeddings with the worker's model (see ``document_pipeline.embed_texts``)."""
+    return embed_texts(texts, nlp=_worker["nlp"])
+
+
+def _report(job_id, stage, progress, **details):
+    """Sends a progress event for ``job_id`` to the web process."""
+    _worker["events"].put((job_id, stage, progress, time.time(), details))
+
+
+def _extract_graph(job_id, pdf_path, sha256, timings, report=None):
+    """Returns the document's entities and relationships, from the cache if possible.
+
+    Pages go from PyMuPDF straight into the NLP stage (overlapping with NER
+    under the "pipe" engine) and both are reported together as the
+    "processing" stage. When
+    only the graph entry is missing (the extraction settings changed), the
+    cached pages are used instead of the PDF. On a cache miss ``report``
+    receives the canonicalization counts.
+    """
+    cache = _worker["cache"]
+    pages = None
+    if cache is not None:
+        cached = cache.get(sha256)
+        if cached is not None:
+            _report(job_id, "processing", 0.6, cache="hit")
+            return cached
+        pages = cache.get_pages(sha256)
+
+    start = time.perf_counter()
+    if pages is not None:
+        _report(job_id, "processing", 0.05, cache="text")
+        total_pages = len(pages)
+    else:
+        _report(job_id, "processing", 0.05, cache="miss" if cache is not None else "disabled")
+        total_pages = count_pdf_pages(pdf_path)
+        if not total_pages:
+            raise ValueError("The PDF has no pages")
+        pages = iter_pages(pdf_path)
+        if cache is not None:
+            pages = cache.tee_pages(sha256, pages)
+
+    def on_page(done):
+        _report(job_id, "processing", 0.05 + 0.55 * done / total_pages,
+                pages_read=done, total_pages=total_pages)
+
+    entities, relationships = process_pages_to_graph(pages, nlp=_worker["nlp"], on_page=on_page, report=report)
+    timings["processing"] = round(time.perf_counter() - start, 4)
+    if cache is not None:
+        cache.put(sha256, entities, relationships)
+    return entities, relationships
+
+
+def store_document(backend, sha256, filename, entities, relationships, batch_size, on_batch=None, timings=None):
+    """Writes a document's graph with provenance, marks it loaded and updates article groups.
+
+    Returns the job result reported by /api/jobs.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    stats = backend.write_graph(entities, relationships, batch_size=batch_size,
+                                on_batch=on_batch, document=sha256)
+    backend.mark_document_loaded(sha256, filename)
+    backend.update_article_groups(sha256, batch_size=batch_size)
+    backend.flush()
+    timings["write"] = round(time.perf_counter() - start, 4)
+    return {
+        "sha256": sha256,
+        "entities_found": len(entities),
+        "relationships_found": len(relationships),
+        "write_batches": len(stats["batches"]),
+        "timings": timings,
+    }
+
+
+def _run_job(job_id, pdf_path, sha256, filename):
+    """Runs extraction, NER and the graph write for one document.
+
+    Documents whose content hash is already in the graph are skipped, and
+    cached NLP results skip straight to the graph write. Workers without a
+    backend return the extracted ``entities`` and ``relationships`` instead.
+    """
+    timings = {}
+    report = {}
+    backend = _worker["backend"]
+
+    if backend is not None and backend.is_document_loaded(sha256):
+        return {"already_loaded": True, "sha256": sha256, "timings": timings}
+
+    entities, relationships = _extract_graph(job_id, pdf_path, sha256, timings, report)
+    if backend is None:
+        return {"sha256": sha256, "entities": entities, "relationships": relationships, "timings": timings,
+                "canonicalization": report}
+
+    _report(job_id, "writing", 0.6, timings=dict(timings))
+
+    def on_batch(done, total):
+        _report(job_id, "writing", 0.6 + 0.4 * done / max(total, 1),
+                batches_written=done, total_batches=total)
+
+    result = store_document(backend, sha256, filename, entities, relationships,
+                            _worker["batch_size"], on_batch, timings)
+    if report:
+        result["canonicalization"] = report
+    return result
+
+
+# --- WEB PROCESS SIDE ---
+
+class JobManager:
+    """Tracks ingestion jobs and dispatches them to a pool of worker processes.
+
+    The pool is started on the first submission so that importing the web
+    application (for example in the Flask reloader parent) spawns nothing.
+    ``on_finish`` is called with a snapshot of every job that completes.
+    When a ``backend`` is given, workers do not connect to Neo4j; the graphs
+    they extract are written through ``backend`` in this process, one at a
+    time, from the pool's result thread.
+    """
+
+    def __init__(self, uri, auth, workers=2, max_pending=8, max_backlog=200, batch_size=1000,
+                 model_name=NLP_MODEL_NAME, cache_dir=None, cache_max_bytes=512 * 1024 * 1024,
+                 history=200, on_finish=None, backend=None):
+        self.workers = workers
+        self.on_finish = on_finish
+        self.max_pending = max_pending
+        self.max_backlog = max_backlog
+        self.history = history
+        self.batch_size = batch_size
+        self.backend = backend
+        self._initargs = (None if backend is not None else uri, auth, model_name, batch_size,
+                          cache_dir, cache_max_bytes)
+        self._jobs = {}
+        self._batches = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._events = None
+        self._ready_workers = set()
+        self._warm_up_error = None
+
+    def _start(self):
+        """Starts the worker pool and the thread that applies progress events.
+
+        Must be called with ``self._lock`` held. A replacement pool reuses the
+        event queue and its thread.
+        """
+        context = multiprocessing.get_context("spawn")
+        if self._events is None:
+            self._events = context.Queue()
+            threading.Thread(target=self._consume_events, name="ingest-events", daemon=True).start()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=self._initargs + (self._events,),
+        )
+
+    def _replace_pool(self, broken):
+        """Shuts down the ``broken`` pool and starts a new one, unless that was already done.
+
+        Must be called with ``self._lock`` held.
+        """
+        if self._executor is not broken:
+            return
+        print("Ingestion worker pool is broken; starting a new one")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._ready_workers.clear()
+        self._start()
+
+    def _submit(self, fn, *args):
+        """Submits ``fn`` to the pool and returns ``(executor, future)``.
+
+        Starts the pool if needed, and replaces it once if it turns out to be
+        broken; a second failure is raised.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._start()
+            executor = self._executor
+            try:
+                return executor, executor.submit(fn, *args)
+            except RuntimeError:
+                # BrokenProcessPool, or a pool shut down after a failure
+                self._replace_pool(executor)
+                executor = self._executor
+                return executor, executor.submit(fn, *args)
+
+    def warm_up(self):
+        """Starts the pool now so every worker loads its NLP model before the first upload."""
+        futures = [self._submit(_ping)[1] for _ in range(self.workers)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self._warm_up_error = str(e)
+                print(f"Error starting ingestion workers: {e}")
+                return False
+        return True
+
+    def embed(self, texts):
+        """Computes the embeddings of ``texts`` in a worker and returns them as a float32 matrix.
+
+        Blocks until the worker is done; starts the pool if needed.
+        """
+        executor, future = self._submit(_embed, list(texts))
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            with self._lock:
+                self._replace_pool(executor)
+            raise
+
+    def status(self):
+        """Reports whether the pool is running and how many workers have their model loaded."""
+        with self._lock:
+            return {
+                "started": self._executor is not None,
+                "workers": self.workers,
+                "ready_workers": len(self._ready_workers),
+                "pending_jobs": self.pending(),
+                "batch_backlog": self.backlog(),
+                "error": self._warm_up_error,
+            }
+
+    def _consume_events(self):
+        while True:
+            self._apply(*self._events.get())
+
+    def _apply(self, job_id, stage, progress, at, details):
+        """Applies one progress event to the job it belongs to."""
+        with self._lock:
+            if job_id is None:
+                if stage == "worker_ready":
+                    self._ready_workers.add(details["pid"])
+                return
+            job = self._jobs.get(job_id)
+            if job is None or job["stage"] in FINISHED_STAGES:
+                return
+            if job["stage"] != stage:
+                job["stages"][stage] = at
+            job["stage"] = stage
+            job["progress"] = round(progress, 3)
+            job.update(details)
+
+    def pending(self):
+        """Returns how many jobs are queued or running."""
+        return sum(1 for job in self._jobs.values() if job["stage"] not in FINISHED_STAGES)
+
+    def backlog(self):
+        """Returns how many documents batches have yet to submit."""
+        return sum(len(batch["_waiting"]) for batch in self._batches.values())
+
+    def _check_capacity(self, count=1):
+        """Raises ``QueueFullError`` unless ``count`` more jobs fit under ``max_pending``.
+
+        Must be called with ``self._lock`` held.
+        """
+        if self.pending() + count > self.max_pending:
+            raise QueueFullError(
+                f"Ingestion queue is full ({self.pending()} of {self.max_pending} jobs pending); try again later"
+            )
+
+    def _add_job(self, filename, sha256, batch_id=None):
+        """Registers a queued job and returns its id; must be called with ``self._lock`` held."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._jobs[job_id] = {
+            "id": job_id,
+            "filename": filename,
+            "sha256": sha256,
+            "batch_id": batch_id,
+            "stage": "queued",
+            "progress": 0.0,
+            "submitted_at": now,
+            "stages": {"queued": now},
+            "timings": {},
+            "result": None,
+            "error": None,
+            "_order": next(self._order),
+        }
+        self._prune()
+        return job_id
+
+    def _dispatch(self, job_id, pdf_path, filename, sha256):
+        """Hands a registered job to the pool; returns False if it was settled without entering it."""
+        if self.backend is not None and self.backend.is_document_loaded(sha256):
+            self._settle(job_id, {"already_loaded": True, "sha256": sha256, "timings": {}}, None)
+            return False
+        try:
+            executor, future = self._submit(_run_job, job_id, pdf_path, sha256, filename)
+        except RuntimeError as e:
+            self._settle(job_id, None, e)
+            return False
+        future.add_done_callback(lambda f: self._finish(job_id, filename, f, executor))
+        return True
+
+    def submit(self, pdf_path, filename, sha256):
+        """Queues a document for ingestion and returns its job id.
+
+        Raises ``QueueFullError`` when ``max_pending`` jobs are already waiting.
+        """
+        with self._lock:
+            self._check_capacity()
+            job_id = self._add_job(filename, sha256)
+        self._dispatch(job_id, pdf_path, filename, sha256)
+        return job_id
+
+    def submit_batch(self, documents, parallelism=None, skipped=()):
+        """Queues ``(pdf_path, filename, sha256)`` documents as one batch and returns its id.
+
+        At most ``parallelism`` documents of the batch (default: one per
+        worker) are in the pool at a time, and only while the queue has room
+        under ``max_pending``. ``skipped`` lists ``{"filename", "reason"}``
+        entries of files that were not queued, for the report. Raises
+        ``QueueFullError`` unless the whole batch fits in ``max_backlog``.
+        """
+        parallelism = max(1, parallelism or self.workers)
+        with self._lock:
+            if self.backlog() + len(documents) > self.max_backlog:
+                raise QueueFullError(
+                    f"Batch backlog is full ({self.backlog()} of {self.max_backlog} documents waiting); "
+                    f"try again later"
+                )
+            batch_id = uuid.uuid4().hex
+            self._batches[batch_id] = {
+                "id": batch_id,
+                "parallelism": parallelism,
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "files": [{"filename": filename, "sha256": sha256, "job_id": None, "job": None}
+                          for _, filename, sha256 in documents],
+                "skipped": list(skipped),
+                "_waiting": deque(enumerate(documents)),
+                "_running": 0,
+                "_order": next(self._order),
+            }
+            self._prune_batches()
+        self._advance_batch(batch_id)
+        return batch_id
+
+    def _advance_batch(self, batch_id):
+        """Submits waiting documents of a batch until ``parallelism`` of them are running or the queue is full.
+
+        Documents settled without entering the pool free their slot at once,
+        so the loop runs again instead of recursing through ``_finish``.
+        """
+        while True:
+            dispatch = []
+            with self._lock:
+                batch = self._batches.get(batch_id)
+                if batch is None:
+                    return
+                while (batch["_waiting"] and batch["_running"] < batch["parallelism"]
+                       and self.pending() < self.max_pending):
+                    index, (pdf_path, filename, sha256) = batch["_waiting"].popleft()
+                    job_id = self._add_job(filename, sha256, batch_id)
+                    batch["files"][index]["job_id"] = job_id
+                    batch["_running"] += 1
+                    dispatch.append((job_id, pdf_path, filename, sha256))
+                if not batch["_waiting"] and not batch["_running"] and batch["finished_at"] is None:
+                    batch["finished_at"] = time.time()
+            settled = [not self._dispatch(*job) for job in dispatch]
+            if not any(settled):
+                return
+
+    def _write(self, job_id, filename, result):
+        """Writes a graph returned by a worker through ``self.backend``."""
+        sha256, timings = result["sha256"], result["timings"]
+        if self.backend.is_document_loaded(sha256):
+            return {"already_loaded": True, "sha256": sha256, "timings": timings}
+        self._apply(job_id, "writing", 0.6, time.time(), {"timings": dict(timings)})
+
+        def on_batch(done, total):
+            self._apply(job_id, "writing", 0.6 + 0.4 * done / max(total, 1), time.time(),
+                        {"batches_written": done, "total_batches": total})
+
+        written = store_document(self.backend, sha256, filename, result["entities"], result["relationships"],
+                                 self.batch_size, on_batch, timings)
+        if result.get("canonicalization"):
+            written["canonicalization"] = result["canonicalization"]
+        return written
+
+    def _finish(self, job_id, filename, future, executor=None):
+        error = future.exception()
+        result = future.result() if error is None else None
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                self._replace_pool(executor)
+        if result is not None and "entities" in result:
+            try:
+                result = self._write(job_id, filename, result)
+            except Exception as e:
+                error = e
+        self._settle(job_id, result, error)
+        self._advance_batches()
+
+    def _advance_batches(self):
+        """Gives the queue slot a finished job freed to the unfinished batches, oldest first."""
+        with self._lock:
+            unfinished = sorted((batch for batch in self._batches.values() if batch["finished_at"] is None),
+                                key=lambda batch: batch["_order"])
+            batch_ids = [batch["id"] for batch in unfinished]
+        for batch_id in batch_ids:
+            self._advance_batch(batch_id)
+
+    def _settle(self, job_id, result, error):
+        """Records the outcome of a job and frees its batch slot; returns the job snapshot."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            now = time.time()
+            if error is None:
+                job["result"] = result
+                job["timings"] = result["timings"]
+                job["stage"] = "done"
+                job["progress"] = 1.0
+            else:
+                job["error"] = str(error)
+                job["stage"] = "failed"
+            job["stages"][job["stage"]] = now
+            job["timings"]["total"] = round(now - job["submitted_at"], 4)
+            snapshot = dict(job)
+            batch = self._batches.get(job["batch_id"])
+            if batch is not None:
+                batch["_running"] -= 1
+                for entry in batch["files"]:
+                    if entry["job_id"] == job_id:
+                        # Kept here so the report survives the pruning of old jobs
+                        entry["job"] = snapshot
+        if self.on_finish:
+            self.on_finish(snapshot)
+        return snapshot
+
+    def _prune(self):
+        """Forgets the oldest finished jobs beyond the configured history size."""
+        finished = [job for job in self._jobs.values() if job["stage"] in FINISHED_STAGES]
+        if len(finished) > self.history:
+            finished.sort(key=lambda job: job["_order"])
+            for job in finished[:len(finished) - self.history]:
+                del self._jobs[job["id"]]
+
+    def _prune_batches(self):
+        """Forgets the oldest finished batches beyond the configured history size."""
+        finished = [batch for batch in self._batches.values() if batch["finished_at"] is not None]
+        if len(finished) > self.history:
+            finished.sort(key=lambda batch: batch["_order"])
+            for batch in finished[:len(finished) - self.history]:
+                del self._batches[batch["id"]]
+
+    def get_batch(self, batch_id):
+        """Returns the aggregate report of a batch, or None if it is unknown.
+
+        Each file reports its stage (``waiting`` until it enters the pool),
+        entity and relationship counts, timings and error; ``totals`` sums
+        them over the batch and ``elapsed`` runs until the last file finished.
+        """
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+            files = []
+            totals = {"files": len(batch["files"]), "skipped": len(batch["skipped"]), "waiting": 0, "running": 0,
+                      "done": 0, "failed": 0, "already_loaded": 0, "entities_found": 0, "relationships_found": 0}
+            for entry in batch["files"]:
+                job = entry["job"] or self._jobs.get(entry["job_id"]) or {}
+                result = job.get("result") or {}
+                stage = job.get("stage", "waiting")
+                files.append({
+                    "filename": entry["filename"],
+                    "sha256": entry["sha256"],
+                    "job_id": entry["job_id"],
+                    "stage": stage,
+                    "progress": job.get("progress", 0.0),
+                    "already_loaded": bool(result.get("already_loaded")),
+                    "entities_found": result.get("entities_found"),
+                    "relationships_found": result.get("relationships_found"),
+                    "timings": dict(job.get("timings") or {}),
+                    "error": job.get("error"),
+                })
+                if stage in FINISHED_STAGES:
+                    totals[stage] += 1
+                else:
+                    totals["waiting" if stage == "waiting" else "running"] += 1
+                totals["already_loaded"] += bool(result.get("already_loaded"))
+                totals["entities_found"] += result.get("entities_found") or 0
+                totals["relationships_found"] += result.get("relationships_found") or 0
+            end = batch["finished_at"] or time.time()
+            return {
+                "id": batch["id"],
+                "stage": "done" if batch["finished_at"] is not None else "running",
+                "parallelism": batch["parallelism"],
+                "submitted_at": batch["submitted_at"],
+                "finished_at": batch["finished_at"],
+                "elapsed": round(end - batch["submitted_at"], 4),
+                "totals": totals,
+                "files": files,
+                "skipped": list(batch["skipped"]),
+            }
+
+    def get(self, job_id):
+        """Returns a snapshot of a job's status, or None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {key: value for key, value in job.items() if not key.startswith("_")}
+            snapshot["stages"] = dict(job["stages"])
+            snapshot["timings"] = dict(job["timings"])
+            return snapshot
@@ -0,0 +1,202 @@
+"""Bounded shortest-path search between two nodes, behind ``/api/path``.
+
+``bidirectional_bfs`` finds one shortest (fewest hops) path: it grows a
+breadth-first search from each end, always expanding one full level of the
+smaller frontier, and stops when they meet. With branching factor b and
+distance d that visits about 2·b^(d/2) nodes instead of b^d.
+
+``k_shortest_paths`` runs Yen's algorithm on top of it: every next path is
+the shortest deviation ("spur") from a prefix of an earlier one, searched
+with that prefix's nodes and already used continuations blocked, so the
+paths come out loopless and by increasing length.
+
+Both take the adjacency as a ``neighbors(node)`` callable yielding
+``(edge, other node)``, so they run on the ``PathIndex`` snapshot built by
+the web application after each write and on the embedded store's own
+arrays alike. Every search also takes a ``time.monotonic()`` deadline and
+gives up when it passes, returning the paths found so far.
+"""
+import heapq
+import time
+
+DEFAULT_PATHS = 3
+DEFAULT_MAX_DEPTH = 4
+
+
+class SearchTimeout(Exception):
+    """The deadline of a path search passed."""
+
+
+def bidirectional_bfs(source, target, neighbors, max_depth, deadline=None, blocked_nodes=(), blocked_edges=()):
+    """Returns ``(nodes, edges)`` of one shortest path of at most ``max_depth`` edges, or None.
+
+    ``blocked_nodes`` and ``blocked_edges`` are never used (``source`` and
+    ``target`` must not be blocked). Raises ``SearchTimeout`` once
+    ``deadline`` passes.
+    """
+    if source == target:
+        return [source], []
+    # node -> (previous node, edge, distance from that side's end)
+    forward = {source: (None, None, 0)}
+    backward = {target: (None, None, 0)}
+    frontiers = {True: [source], False: [target]}
+    depths = {True: 0, False: 0}
+    while frontiers[True] and frontiers[False] and depths[True] + depths[False] < max_depth:
+        is_forward = len(frontiers[True]) <= len(frontiers[False])
+        seen, other = (forward, backward) if is_forward else (backward, forward)
+        depth = depths[is_forward] + 1
+        reached = []
+        best = None
+        for node in frontiers[is_forward]:
+            if deadline is not None and time.monotonic() > deadline:
+                raise SearchTimeout()
+            for edge, neighbour in neighbors(node):
+                if neighbour in seen or neighbour in blocked_nodes or edge in blocked_edges:
+                    continue
+                seen[neighbour] = (node, edge, depth)
+                reached.append(neighbour)
+                if neighbour in other:
+                    length = depth + other[neighbour][2]
+                    if length <= max_depth and (best is None or length < best[0]):
+                        best = (length, neighbour)
+        if best is not None:
+            return _join(best[1], forward, backward)
+        frontiers[is_forward] = reached
+        depths[is_forward] = depth
+    return None
+
+
+def _join(meeting, forward, backward):
+    nodes, edges = [meeting], []
+    node = meeting
+    while forward[node][0] is not None:
+        node, edge, _ = forward[node]
+        nodes.append(node)
+        edges.append(edge)
+    nodes.reverse()
+    edges.reverse()
+    node = meeting
+    while backward[node][0] is not None:
+        node, edge, _ = backward[node]
+        nodes.append(node)
+        edges.append(edge)
+    return nodes, edges
+
+
+def k_shortest_paths(source, target, neighbors, k=DEFAULT_PATHS, max_depth=DEFAULT_MAX_DEPTH, deadline=None):
+    """Returns ``(paths, complete)``: up to ``k`` loopless ``(nodes, edges)`` paths, shortest first.
+
+    ``complete`` is False when the deadline cut the search short; the paths
+    found until then are still returned.
+    """
+    try:
+        first = bidirectional_bfs(source, target, neighbors, max_depth, deadline)
+    except SearchTimeout:
+        return [], False
+    if first is None:
+        return [], True
+    paths = [first]
+    candidates = []
+    found = {tuple(first[1])}
+    counter = 0
+    try:
+        while len(paths) < k:
+            nodes, edges = paths[-1]
+            for i in range(len(nodes) - 1):
+                root_nodes, root_edges = nodes[:i + 1], edges[:i]
+                used = {path_edges[i] for path_nodes, path_edges in paths if path_nodes[:i + 1] == root_nodes}
+                spur = bidirectional_bfs(nodes[i], target, neighbors, max_depth - i, deadline,
+                                         blocked_nodes=set(root_nodes[:-1]), blocked_edges=used)
+                if spur is None:
+                    continue
+                candidate = (root_nodes[:-1] + spur[0], root_edges + spur[1])
+                if tuple(candidate[1]) not in found:
+                    found.add(tuple(candidate[1]))
+                    counter += 1
+                    heapq.heappush(candidates, (len(candidate[1]), counter, candidate))
+            if not candidates:
+                break
+            paths.append(heapq.heappop(candidates)[2])
+    except SearchTimeout:
+        return paths, False
+    return paths, True
+
+
+def describe_paths(path_records):
+    """Merges path records into ``{"nodes", "edges", "paths"}`` with each node and edge listed once.
+
+    A path record is ``{"nodes": [node view, ...], "edges": [{"key", "type",
+    "weight", "start", "end"}, ...]}`` in path order; each entry of
+    ``paths`` lists the ids of its nodes and edges.
+    """
+    nodes = {}
+    edges = {}
+    paths = []
+    for record in path_records:
+        for view in record["nodes"]:
+            nodes.setdefault(view["id"], view)
+        for edge in record["edges"]:
+            edges.setdefault(str(edge["key"]), {"id": str(edge["key"]), "from": edge["start"], "to": edge["end"],
+                                                "label": edge["type"], "weight": edge["weight"]})
+        paths.append({"nodes": [view["id"] for view in record["nodes"]],
+                      "edges": [str(edge["key"]) for edge in record["edges"]],
+                      "length": len(record["edges"])})
+    return {"nodes": list(nodes.values()), "edges": list(edges.values()), "paths": paths}
+
+
+class PathIndex:
+    """Adjacency snapshot of the graph for path queries, tagged with the generation it was read at."""
+
+    def __init__(self, views, adjacency, edges, generation):
+        self.views = views
+        self.adjacency = adjacency
+        self.edges = edges
+        self.generation = generation
+        self._index = {view["id"]: position for position, view in enumerate(views)}
+
+    def __len__(self):
+        return len(self.views)
+
+    def __contains__(self, node_id):
+        return node_id in self._index
+
+    @classmethod
+    def build(cls, edge_records, generation):
+        """Reads the graph from ``edge_records`` (see ``GraphBackend.iter_edges``); edges are undirected."""
+        index = {}
+        views = []
+        adjacency = []
+        edges = []
+        for record in edge_records:
+            ends = []
+            for view in (record["n"], record["m"]):
+                position = index.get(view["id"])
+                if position is None:
+                    position = index[view["id"]] = len(views)
+                    views.append(view)
+                    adjacency.append([])
+                ends.append(position)
+            edge = len(edges)
+            edges.append({"key": record["key"], "type": record["type"], "weight": record.get("weight") or 1,
+                          "start": record["n"]["id"], "end": record["m"]["id"]})
+            if ends[0] != ends[1]:
+                adjacency[ends[0]].append((edge, ends[1], record["type"]))
+                adjacency[ends[1]].append((edge, ends[0], record["type"]))
+        return cls(views, adjacency, edges, generation)
+
+    def shortest_paths(self, from_id, to_id, k=DEFAULT_PATHS, max_depth=DEFAULT_MAX_DEPTH, types=None,
+                       deadline=None):
+        """Returns ``(path records, complete)`` between two nodes of the snapshot (see ``describe_paths``)."""
+        adjacency = self.adjacency
+        wanted = None if types is None else set(types)
+
+        def neighbors(node):
+            for edge, other, rel_type in adjacency[node]:
+                if wanted is None or rel_type in wanted:
+                    yield edge, other
+
+        paths, complete = k_shortest_paths(self._index[from_id], self._index[to_id], neighbors, k, max_depth,
+                                           deadline)
+        records = [{"nodes": [self.views[node] for node in nodes], "edges": [self.edges[edge] for edge in edges]}
+                   for nodes, edges in paths]
+        return records, complete
@@ -0,0 +1,101 @@
+"""Article groups of graph nodes, computed from where each node came from.
+
+The sources of the graph are ``Paper`` nodes (the seed data) and ``Document``
+nodes (ingested PDFs). Entities extracted from a document are linked to it by
+``(:Document)-[:MENTIONS]->(entity)`` and seed nodes hang off their papers,
+directly or through one intermediate node (an institution through its
+authors). The jobs below turn those links into two node properties:
+
+* ``article_groups``: the group name of every source the node appears in;
+* ``article_group``: that name when there is exactly one source, otherwise
+  ``SHARED_GROUP``. This is what the visualization colors by.
+
+A source's group name is its ``article_group`` property when it has one (the
+seed papers ship with the names the frontend knows), otherwise its full
+label. Work is done in batches walked in ``id(n)`` order, so the cost grows
+with the number of nodes touched, not with the number of papers.
+"""
+from graph_writer import DEFAULT_BATCH_SIZE, MENTIONS
+
+# Labels of the nodes that represent an article
+SOURCE_LABELS = ("Paper", "Document")
+# Group of nodes found in several articles, or in none
+SHARED_GROUP = "Conceitos Compartilhados"
+
+
+def _is_source(var):
+    return "(" + " OR ".join(f"{var}:{label}" for label in SOURCE_LABELS) + ")"
+
+
+_SOURCE_GROUPS = (
+    "SET s.article_group = coalesce(s.article_group, s.full_label, s.title, s.filename, s.sha256), "
+    "s.article_groups = [coalesce(s.article_group, s.full_label, s.title, s.filename, s.sha256)]"
+)
+
+# Sets the groups of each node ``n`` in the batch from its sources, one hop away or else two
+_NODE_GROUPS = (
+    f"OPTIONAL MATCH (n)--(s) WHERE {_is_source('s')} "
+    "WITH n, collect(DISTINCT s.article_group) AS groups "
+    f"OPTIONAL MATCH (n)--(m)--(s) WHERE size(groups) = 0 AND {_is_source('s')} AND NOT {_is_source('m')} "
+    "WITH n, groups + collect(DISTINCT s.article_group) AS groups "
+    "SET n.article_groups = groups, "
+    "n.article_group = CASE size(groups) WHEN 1 THEN groups[0] ELSE $shared END "
+    "RETURN max(id(n)) AS last, count(n) AS updated"
+)
+
+
+def _update_in_batches(session, pattern, condition, batch_size, **params):
+    """Runs ``_NODE_GROUPS`` over the nodes ``n`` matched by ``pattern`` and ``condition``.
+
+    Returns how many nodes were updated.
+    """
+    query = (
+        f"MATCH {pattern} WHERE {condition} AND id(n) > $after "
+        f"WITH n ORDER BY id(n) LIMIT $batch_size {_NODE_GROUPS}"
+    )
+    after = -1
+    total = 0
+    while True:
+        record = session.execute_write(
+            lambda tx: tx.run(query, after=after, batch_size=batch_size,
+                              shared=SHARED_GROUP, **params).single()
+        )
+        if not record or not record["updated"]:
+            return total
+        total += record["updated"]
+        after = record["last"]
+        if record["updated"] < batch_size:
+            return total
+
+
+def compute_article_groups(driver, missing_only=False, batch_size=DEFAULT_BATCH_SIZE, database="neo4j"):
+    """Stores ``article_group``/``article_groups`` on every node (or only on nodes without one).
+
+    Returns the number of non-source nodes updated.
+    """
+    missing = " AND {var}.article_group IS NULL" if missing_only else ""
+    with driver.session(database=database) as session:
+        session.execute_write(
+            lambda tx: tx.run(
+                f"MATCH (s) WHERE {_is_source('s')}{missing.format(var='s')} {_SOURCE_GROUPS}"
+            ).consume()
+        )
+        return _update_in_batches(
+            session, "(n)", f"NOT {_is_source('n')}{missing.format(var='n')}", batch_size
+        )
+
+
+def update_article_groups(driver, sha256, batch_size=DEFAULT_BATCH_SIZE, database="neo4j"):
+    """Recomputes the groups of a newly loaded document and of the entities it mentions.
+
+    Returns the number of entities updated.
+    """
+    with driver.session(database=database) as session:
+        session.execute_write(
+            lambda tx: tx.run(f"MATCH (s:Document {{sha256: $sha256}}) {_SOURCE_GROUPS}",
+                              sha256=sha256).consume()
+        )
+        return _update_in_batches(
+            session, f"(:Document {{sha256: $sha256}})-[:{MENTIONS}]->(n)", "true",
+            batch_size, sha256=sha256,
+        )
@@ -0,0 +1,80 @@
+"""In-process cache of serialized graph read responses.
+
+Entries are keyed by endpoint, query parameters and a graph version counter.
+Every write to the graph bumps the version, which drops all cached bodies at
+once. Each body is stored with an ETag derived from its bytes, so clients
+that send ``If-None-Match`` get a 304 without the body being re-sent. Writes
+made by other processes (for example ``bulk_ingest.py``) are not observed
+directly; the ``ttl`` bounds how long such changes can stay invisible.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU cache of response bodies tagged with the graph version they were built from."""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, endpoint, params):
+        """Builds the cache key for an endpoint and its (already sorted) parameters."""
+        return (self.version, endpoint, tuple(params))
+
+    def get(self, key):
+        """Returns ``(body, etag)`` for ``key`` or None, counting the hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[2] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, body):
+        """Stores a response body and returns ``(body, etag)``."""
+        etag = f"{key[0]}-{hashlib.sha1(body).hexdigest()[:20]}"
+        with self._lock:
+            if key[0] == self.version:
+                self._entries[key] = (body, etag, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return body, etag
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def bump(self):
+        """Marks the graph as changed: increments the version and drops every entry."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            return self.version
+
+    def stats(self):
+        """Returns the version, entry count and hit/miss/304 counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
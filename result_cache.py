@@ -0,0 +1,182 @@
+"""Content-addressed cache of document processing results.
+
+Entries are keyed by the SHA-256 of the PDF bytes and hold the extracted page
+texts and the ``(entities, relationships)`` produced by the NLP stage, as gzip
+files on local disk. Graph entries also record the fingerprint of the
+extraction settings they were made with
+(``document_pipeline.extraction_fingerprint``); after a change of model,
+co-occurrence or canonicalization settings they are misses, and the NLP stage
+runs again on the cached pages instead of the PDF. The cache is shared by
+every worker process: writes go through a temporary file and ``os.replace``,
+reads refresh the entry's modification time, and the least recently used
+entries are evicted once the directory grows past ``max_bytes``.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024
+# Version of the cached graph layout; entries of other versions are misses.
+# Version 2 holds canonicalized entities with their properties (aliases).
+GRAPH_FORMAT = 2
+# Written after every page of a text entry so the pages can be told apart again
+PAGE_BREAK = "\f"
+
+
+def sha256_of_file(path):
+    """Returns the hex SHA-256 of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_upload(stream, directory, suffix=".pdf"):
+    """Saves an uploaded stream under its content hash and returns ``(path, sha256)``.
+
+    The bytes are hashed while they are written, so byte-identical uploads end
+    up in the same file and the upload is only read once.
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for block in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                digest.update(block)
+                f.write(block)
+        sha256 = digest.hexdigest()
+        path = os.path.join(directory, sha256 + suffix)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path, sha256
+
+
+def _encode_graph(entities, relationships, fingerprint=None):
+    weights = relationships if isinstance(relationships, dict) else {}
+    properties = entities if isinstance(entities, dict) else {}
+    return {
+        "format": GRAPH_FORMAT,
+        "fingerprint": fingerprint,
+        "entities": sorted([name, label, properties.get((name, label)) or {}] for name, label in entities),
+        "relationships": [
+            [list(ent1), rel_type, list(ent2), weights.get((ent1, rel_type, ent2), {})]
+            for (ent1, rel_type, ent2) in relationships
+        ],
+    }
+
+
+def _decode_graph(data):
+    entities = {(name, label): props for name, label, props in data["entities"]}
+    relationships = {}
+    for ent1, rel_type, ent2, *weight in data["relationships"]:
+        relationships[(tuple(ent1), rel_type, tuple(ent2))] = weight[0] if weight else {}
+    return entities, relationships
+
+
+class ResultCache:
+    """Size-bounded LRU cache of extracted text and NLP results on disk."""
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, fingerprint=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, kind):
+        return os.path.join(self.directory, f"{key}.{kind}.gz")
+
+    def _atomic_write(self, path, payload):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, key):
+        """Returns ``(entities, relationships)`` for ``key``, or None on a miss."""
+        path = self._path(key, "graph")
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != GRAPH_FORMAT or data.get("fingerprint") != self.fingerprint:
+            return None
+        return _decode_graph(data)
+
+    def get_pages(self, key):
+        """Returns the cached page texts for ``key``, or None on a miss.
+
+        Text stored without page breaks comes back as a single page.
+        """
+        path = self._path(key, "text")
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        if PAGE_BREAK not in text:
+            return [text]
+        return text.split(PAGE_BREAK)[:-1]
+
+    def tee_pages(self, key, pages):
+        """Yields ``pages`` unchanged while writing them to the text entry of ``key``.
+
+        The text file only becomes visible once the iterator is exhausted, so
+        an interrupted extraction never leaves a truncated entry behind.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                for page in pages:
+                    f.write((page + PAGE_BREAK).encode("utf-8"))
+                    yield page
+            os.replace(tmp_path, self._path(key, "text"))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put(self, key, entities, relationships, text=None):
+        """Stores the NLP results (and optionally the text) for ``key``, then evicts."""
+        if text is not None:
+            self._atomic_write(self._path(key, "text"), text.encode("utf-8"))
+        payload = json.dumps(_encode_graph(entities, relationships, self.fingerprint)).encode("utf-8")
+        self._atomic_write(self._path(key, "graph"), payload)
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in ``max_bytes``."""
+        entries = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".gz"):
+                continue
+            key = name.split(".", 1)[0]
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            size, last_used = entries.get(key, (0, 0.0))
+            entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for kind in ("graph", "text"):
+                try:
+                    os.remove(self._path(key, kind))
+                except OSError:
+                    pass
+            total -= size
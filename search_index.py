@@ -0,0 +1,157 @@
+"""In-memory inverted index behind /api/search.
+
+Every searchable item (a graph node or a publication of the corpus CSV) is a
+document with an id, a text and a payload returned with the results. Texts
+are folded to lower-case ASCII and split into alphanumeric tokens; the index
+maps each token to ``{doc id: term frequency}`` and keeps the vocabulary
+sorted so that the last query token can be completed by prefix with two
+binary searches.
+
+Queries match documents containing every token (the last one by prefix when
+autocompleting) and rank them with BM25, boosted when the whole text starts
+with the query. Adding a document updates the postings in place, so the index
+follows ingestion without rebuilds.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+# Vocabulary terms a prefix may expand to; keeps one-letter prefixes cheap
+MAX_PREFIX_EXPANSIONS = 64
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Score multiplier for texts that start with the query (autocomplete feel)
+STARTS_WITH_BOOST = 2.0
+
+
+def fold(text):
+    """Lower-cases ``text`` and strips accents ("Células" -> "celulas")."""
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(fold(text))
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking, prefix completion and incremental updates."""
+
+    def __init__(self):
+        self._postings = {}
+        self._vocabulary = []
+        self._docs = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id, text, payload):
+        """Indexes (or re-indexes) ``text`` under ``doc_id``; ``payload`` is returned by ``search``."""
+        tokens = tokenize(text)
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove(doc_id)
+            for token, count in Counter(tokens).items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._vocabulary, token)
+                postings[doc_id] = count
+            self._docs[doc_id] = (fold(text), len(tokens), payload)
+            self._total_length += len(tokens)
+
+    def get(self, doc_id):
+        """Returns the payload indexed under ``doc_id``, or None."""
+        with self._lock:
+            entry = self._docs.get(doc_id)
+            return None if entry is None else entry[2]
+
+    def items(self):
+        """Returns a snapshot of ``(doc_id, payload)`` for every indexed document."""
+        with self._lock:
+            return [(doc_id, entry[2]) for doc_id, entry in self._docs.items()]
+
+    def remove(self, doc_id):
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        folded, length, _ = self._docs.pop(doc_id)
+        self._total_length -= length
+        for token in set(TOKEN_PATTERN.findall(folded)):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _expand(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff", start)
+        return self._vocabulary[start:min(end, start + MAX_PREFIX_EXPANSIONS)]
+
+    def search(self, query, limit=20, prefix=True, accept=None):
+        """Returns up to ``limit`` ``(score, payload)`` pairs, best first.
+
+        With ``prefix`` the last query token also matches longer tokens
+        (``"mic"`` finds "microgravity"). ``accept(payload)`` filters results.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        folded_query = fold(query).strip()
+        with self._lock:
+            # One list of (term, postings) alternatives per query token
+            clauses = []
+            for position, token in enumerate(tokens):
+                if prefix and position == len(tokens) - 1:
+                    terms = self._expand(token)
+                else:
+                    terms = [token] if token in self._postings else []
+                if not terms:
+                    return []
+                clauses.append([(term, self._postings[term]) for term in terms])
+
+            # Intersect starting from the most selective clause
+            clauses.sort(key=lambda clause: sum(len(postings) for _, postings in clause))
+            candidates = set()
+            for _, postings in clauses[0]:
+                candidates.update(postings)
+            for clause in clauses[1:]:
+                candidates = {doc_id for doc_id in candidates
+                              if any(doc_id in postings for _, postings in clause)}
+                if not candidates:
+                    return []
+
+            total_docs = len(self._docs)
+            average_length = self._total_length / total_docs if total_docs else 1.0
+            scored = []
+            for doc_id in candidates:
+                folded, length, payload = self._docs[doc_id]
+                if accept is not None and not accept(payload):
+                    continue
+                norm = K1 * (1 - B + B * length / average_length)
+                score = 0.0
+                for clause in clauses:
+                    best = 0.0
+                    for _, postings in clause:
+                        frequency = postings.get(doc_id)
+                        if frequency:
+                            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                            best = max(best, idf * frequency * (K1 + 1) / (frequency + norm))
+                    score += best
+                if folded.startswith(folded_query):
+                    score *= STARTS_WITH_BOOST
+                scored.append((score, payload))
+        return heapq.nlargest(limit, scored, key=lambda item: item[0])
@@ -0,0 +1,182 @@
+"""Nearest-neighbour index over entity and paper embeddings, behind /api/similar.
+
+Embeddings are the spaCy word vectors of a node's label or a paper's title
+(see ``document_pipeline.embed_texts``), computed once by an ingestion worker
+when the item is first seen. They are L2-normalised and stored as rows of one
+contiguous float32 matrix, so cosine similarity against every item is a
+single matrix product. Queries are answered in blocks of ``block_rows`` rows,
+keeping a running top-k, which bounds the temporary score matrix for large
+indexes and lets several queries share one pass.
+
+The matrix is saved as ``vectors.npy`` next to ``keys.json``. With ``mmap``
+it is memory-mapped read-only on load and only copied into memory when new
+vectors are added.
+"""
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+DEFAULT_BLOCK_ROWS = 8192
+
+
+def normalize_rows(vectors):
+    """Returns float32 unit-length copies of ``vectors``; all-zero rows stay zero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class VectorIndex:
+    """Cosine-similarity index of normalised embeddings keyed by item id."""
+
+    def __init__(self, directory=None, mmap=False, block_rows=DEFAULT_BLOCK_ROWS):
+        self.directory = directory
+        self.mmap = mmap
+        self.block_rows = block_rows
+        self._keys = []
+        self._rows = {}
+        self._matrix = None
+        self._size = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        return os.path.join(self.directory, "vectors.npy"), os.path.join(self.directory, "keys.json")
+
+    def _ensure_loaded(self):
+        """Loads the saved matrix on first use, so processes that never query it read nothing."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.directory:
+                matrix_path, keys_path = self._paths()
+                if os.path.exists(matrix_path) and os.path.exists(keys_path):
+                    with open(keys_path, encoding="utf-8") as f:
+                        self._keys = json.load(f)
+                    self._matrix = np.load(matrix_path, mmap_mode="r" if self.mmap else None)
+                    # The matrix is saved before the keys, so it may hold extra rows
+                    self._size = min(len(self._keys), self._matrix.shape[0])
+                    self._keys = self._keys[:self._size]
+                    self._rows = {key: row for row, key in enumerate(self._keys)}
+            self._loaded = True
+
+    def __len__(self):
+        self._ensure_loaded()
+        return self._size
+
+    def __contains__(self, key):
+        self._ensure_loaded()
+        return key in self._rows
+
+    @property
+    def dimensions(self):
+        self._ensure_loaded()
+        return 0 if self._matrix is None else self._matrix.shape[1]
+
+    def add(self, keys, vectors):
+        """Stores the normalised ``vectors`` under ``keys``, replacing existing rows.
+
+        Items without a vector (all-zero rows, e.g. out-of-vocabulary names)
+        are skipped. Returns how many rows were stored.
+        """
+        self._ensure_loaded()
+        vectors = normalize_rows(vectors)
+        if not len(keys) or vectors.shape[1] == 0:
+            return 0
+        keep = np.flatnonzero(vectors.any(axis=1))
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((max(len(keep), 1), vectors.shape[1]), dtype=np.float32)
+            elif vectors.shape[1] != self._matrix.shape[1]:
+                raise ValueError(f"Expected {self._matrix.shape[1]}-dimensional vectors, got {vectors.shape[1]}")
+            new_keys = [keys[i] for i in keep if keys[i] not in self._rows]
+            needed = self._size + len(new_keys)
+            capacity = self._matrix.shape[0]
+            if needed > capacity or not self._matrix.flags.writeable:
+                # Grow geometrically (a read-only memory map is copied into memory once)
+                if needed > capacity:
+                    capacity = max(needed, capacity * 2)
+                grown = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+            for i in keep:
+                key = keys[i]
+                row = self._rows.get(key)
+                if row is None:
+                    row = self._rows[key] = self._size
+                    self._keys.append(key)
+                    self._size += 1
+                self._matrix[row] = vectors[i]
+            return len(keep)
+
+    def vector(self, key):
+        """Returns the stored (normalised) vector of ``key``, or None."""
+        self._ensure_loaded()
+        row = self._rows.get(key)
+        return None if row is None else np.array(self._matrix[row])
+
+    def search(self, queries, k=10):
+        """Returns, for each query vector, up to ``k`` ``(key, score)`` pairs by cosine similarity."""
+        self._ensure_loaded()
+        queries = normalize_rows(np.atleast_2d(queries))
+        with self._lock:
+            size, matrix = self._size, self._matrix
+        if not size or k < 1:
+            return [[] for _ in range(len(queries))]
+        k = min(k, size)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, size, self.block_rows):
+            block = matrix[start:min(start + self.block_rows, size)]
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(
+                np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, axis=1)
+        return [
+            [(self._keys[row], float(score)) for row, score in zip(rows[ranking], scores[ranking])]
+            for rows, scores, ranking in zip(best_rows, best_scores, order)
+        ]
+
+    def save(self):
+        """Writes the matrix and keys atomically (no-op without a directory)."""
+        if not self.directory:
+            return
+        self._ensure_loaded()
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path, keys_path = self._paths()
+        with self._lock:
+            matrix = np.ascontiguousarray(self._matrix[:self._size]) if self._matrix is not None else None
+            keys = list(self._keys)
+        if matrix is None:
+            return
+        for path, write in ((matrix_path, lambda f: np.save(f, matrix)),
+                            (keys_path, lambda f: f.write(json.dumps(keys).encode("utf-8")))):
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def clear(self):
+        """Forgets every vector and removes the saved files."""
+        with self._lock:
+            self._keys, self._rows, self._matrix, self._size = [], {}, None, 0
+            self._loaded = True
+        if self.directory:
+            for path in self._paths():
+                if os.path.exists(path):
+                    os.remove(path)